@@ -4,11 +4,34 @@ TBM API Client (synchronous version for AWS Lambda)
 Uses SIRI-Lite API from Bordeaux Métropole
 """
 
+import functools
+import json
+import os
 import re
 import requests
+import tempfile
+import threading
+import time
 import unicodedata
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# C-accelerated string similarity (optional - falls back to substring matching)
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    fuzz = None
+
+# Fast JSON parser for API responses (optional - falls back to requests' stdlib json)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +42,38 @@ API_KEY = "opendata-bordeaux-metropole-flux-gtfs-rt"
 # Bounding box for Bordeaux area (W, N, E, S)
 BBOX = (-0.81, 45.10, -0.35, 44.70)
 
+# HTTP connection pool and retry policy (connections are reused across warm invocations).
+# A failed connect or a gateway error is retried once; a slow read is not retried.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 8
+RETRY = Retry(total=1, connect=1, read=0, backoff_factor=0.1, status_forcelist=(502, 503, 504))
+
+# (connect, read) timeouts in seconds. The lines and stop points downloads are large and
+# mostly run in the background warmup, so they keep a long read timeout; departures are
+# asked while Alexa waits (about 8 s), so a call takes at most 2 * (1 + 2) s.
+DISCOVERY_TIMEOUT = (1, 20)
+MONITORING_TIMEOUT = (1, 2)
+
+# Max concurrent API calls when checking stop directions
+MAX_WORKERS = POOL_MAXSIZE
+
+# How long a stop without departures stays filtered out (the service may just be stopped for the night)
+DIRECTION_MISS_TTL = 300  # seconds
+
+# On-disk snapshot of the lines/stop points caches. Warm invocations use the in-memory caches of the
+# module-level client; the file only helps when the runtime restarts inside the same execution
+# environment (e.g. after a crash or timeout), since a new environment starts with an empty /tmp.
+CACHE_FILE = os.path.join(tempfile.gettempdir(), "tbm_cache.json")
+CACHE_TTL = 3600  # seconds, per section from the time it was fetched
+
+# Sections of the disk snapshot
+_CACHE_SECTIONS = ("lines", "stop_points")
+
+# Paths to the item lists in SIRI responses
+_LINES_PATH = ("Siri", "LinesDelivery", "AnnotatedLineRef")
+_STOP_POINTS_PATH = ("Siri", "StopPointsDelivery", "AnnotatedStopPointRef")
+_STOP_MONITORING_PATH = ("Siri", "ServiceDelivery", "StopMonitoringDelivery")
+
 # Preview interval for departures
 DEFAULT_PREVIEW = "PT90M"
 
@@ -32,21 +87,37 @@ FRENCH_NUMBERS = {
     "quarante": "40", "cinquante": "50", "soixante": "60",
 }
 
+# Characters NFKD does not decompose to ASCII, kept instead of being dropped
+_ASCII_FOLD = str.maketrans({"œ": "oe", "Œ": "OE", "æ": "ae", "Æ": "AE", "’": "'"})
+
+# Single alternation over all number words, longest first ("dix-sept" before "dix").
+# Both patterns run on normalized (ASCII-only) text, hence re.ASCII.
+_FRENCH_NUM_RE = re.compile(
+    r'\b(' + '|'.join(map(re.escape, sorted(FRENCH_NUMBERS, key=len, reverse=True))) + r')\b',
+    re.ASCII,
+)
 
+# Keyword splitting on spaces and punctuation
+_SPLIT_RE = re.compile(r'[\s\-_,.]+', re.ASCII)
+
+# Common articles ignored in keyword matching
+STOPWORDS = frozenset({'le', 'la', 'les', 'de', 'du', 'des', 'a', 'au', 'aux', 'et', 'en'})
+
+# Minimum rapidfuzz ratio (0-100) for two keywords to count as a typo match
+WORD_SIMILARITY_CUTOFF = 85
+
+
+@functools.lru_cache(maxsize=4096)
 def normalize_text(text: str) -> str:
     """Normalize text for comparison (remove accents, lowercase)."""
     if not text:
         return ""
     # Remove accents
-    nfkd = unicodedata.normalize("NFKD", text)
-    ascii_text = "".join(c for c in nfkd if not unicodedata.combining(c))
-    result = ascii_text.lower().strip()
+    nfkd = unicodedata.normalize("NFKD", text.translate(_ASCII_FOLD))
+    result = nfkd.encode("ascii", "ignore").decode("ascii").lower().strip()
     
     # Convert French number words to digits
-    for word, digit in FRENCH_NUMBERS.items():
-        result = re.sub(rf'\b{word}\b', digit, result)
-    
-    return result
+    return _FRENCH_NUM_RE.sub(lambda m: FRENCH_NUMBERS[m.group(1)], result)
 
 
 def extract_keywords(text: str) -> List[str]:
@@ -55,12 +126,21 @@ def extract_keywords(text: str) -> List[str]:
         return []
     normalized = normalize_text(text)
     # Split on spaces and punctuation, filter short words
-    words = re.split(r'[\s\-\_\,\.]+', normalized)
+    words = _SPLIT_RE.split(normalized)
     # Keep words with 2+ chars, ignore common articles
-    stopwords = {'le', 'la', 'les', 'de', 'du', 'des', 'a', 'au', 'aux', 'et', 'en'}
-    return [w for w in words if len(w) >= 2 and w not in stopwords]
+    return [w for w in words if len(w) >= 2 and w not in STOPWORDS]
 
 
+def words_match(query_word: str, target_word: str) -> bool:
+    """Check if two keywords match (substring, or close spelling with rapidfuzz)."""
+    if query_word in target_word or target_word in query_word:
+        return True
+    if fuzz is None:
+        return False
+    return fuzz.ratio(query_word, target_word, score_cutoff=WORD_SIMILARITY_CUTOFF) > 0
+
+
+@functools.lru_cache(maxsize=2048)
 def fuzzy_match(query: str, target: str) -> float:
     """
     Calculate fuzzy match score between query and target.
@@ -88,8 +168,12 @@ def fuzzy_match(query: str, target: str) -> float:
     if not query_words or not target_words:
         return 0.0
     
-    # Count matching words
-    matches = sum(1 for qw in query_words if any(qw in tw or tw in qw for tw in target_words))
+    # Count matching words (exact hits via set lookup, then substring/typo fallback)
+    target_set = set(target_words)
+    matches = sum(
+        1 for qw in query_words
+        if qw in target_set or any(words_match(qw, tw) for tw in target_words)
+    )
     score = matches / len(query_words)
     
     return score * 0.7  # Max 0.7 for keyword match
@@ -97,60 +181,214 @@ def fuzzy_match(query: str, target: str) -> float:
 
 def to_int(value: Any, default: int = -1) -> int:
     """Safe conversion to int."""
+    if type(value) is int:
+        return value
+    if value is None:
+        return default
     try:
-        return int(str(value).strip())
+        return int(value.strip() if isinstance(value, str) else str(value))
     except (TypeError, ValueError):
         return default
 
 
-def get_value(v: Any) -> str:
-    """Extract text value from SIRI field (can be list/dict/str)."""
-    if isinstance(v, list):
-        if not v:
-            return ""
-        x = v[0]
-        if isinstance(x, dict):
-            return x.get("value") or x.get("Value") or ""
-        if isinstance(x, str):
-            return x
+def _value_from_dict(v: Dict[str, Any]) -> str:
+    return v.get("value") or v.get("Value") or ""
+
+
+def _value_from_list(v: List[Any]) -> str:
+    if not v:
         return ""
-    if isinstance(v, dict):
-        return v.get("value") or v.get("Value") or ""
-    if isinstance(v, str):
-        return v
+    x = v[0]
+    if type(x) is dict:
+        return _value_from_dict(x)
+    if type(x) is str:
+        return x
     return ""
 
 
+def _value_from_str(v: str) -> str:
+    return v
+
+
+def _value_empty(v: Any) -> str:
+    return ""
+
+
+# SIRI field extractors by JSON type (parsed JSON only yields exact builtin types)
+_VALUE_GETTERS = {list: _value_from_list, dict: _value_from_dict, str: _value_from_str}
+
+
+def _dig(d: Dict[str, Any], path: Tuple[str, ...], default: Any) -> Any:
+    """Follow a path of keys in nested dicts, returning default on any missing key."""
+    for k in path:
+        d = d.get(k)
+        if d is None:
+            return default
+    return d
+
+
+def get_value(v: Any) -> str:
+    """Extract text value from SIRI field (can be list/dict/str)."""
+    return _VALUE_GETTERS.get(type(v), _value_empty)(v)
+
+
+# Worker threads for the stop direction checks, shared by all clients and searches
+_DIRECTION_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+# Single thread writing the disk snapshots, off the request path and one at a time
+_SNAPSHOT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+
 class TBMClient:
     """Client for TBM SIRI-Lite API."""
 
-    def __init__(self, api_base: str = API_BASE, api_key: str = API_KEY):
+    __slots__ = (
+        "_base", "_key", "_session", "_lines_cache", "_stop_points", "_stops_cache", "_lines_index",
+        "_lines_by_code_norm", "_direction_stops_cache", "_lock", "_load_locks", "_saved_at",
+        "_cache_file",
+    )
+
+    def __init__(
+        self, api_base: str = API_BASE, api_key: str = API_KEY, cache_file: Optional[str] = CACHE_FILE
+    ):
         self._base = api_base
         self._key = api_key
         self._session = requests.Session()
-        self._session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=RETRY
+        )
+        self._session.mount("https://", adapter)
+        self._session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",  # Decompressed transparently by urllib3
+            "Connection": "keep-alive",
+        })
         self._lines_cache: Optional[Dict[str, Dict[str, Any]]] = None
+        # Every stop of the area with the lines serving it (one stoppoints-discovery call)
+        self._stop_points: Optional[List[Dict[str, Any]]] = None
+        # Stops of each line, filtered from _stop_points
         self._stops_cache: Dict[str, List[Dict[str, Any]]] = {}
+        # Parallel lists of normalized line names/codes/destinations and line dicts
+        self._lines_index: Dict[str, List[Any]] = {"names": [], "codes": [], "dests": [], "meta": []}
+        # First line (in sorted order) for each normalized line code, for exact lookups
+        self._lines_by_code_norm: Dict[str, Dict[str, Any]] = {}
+        # (has departures, checked at) for (stop_point_ref, line_ref, direction_ref)
+        self._direction_stops_cache: Dict[Tuple[str, str, int], Tuple[bool, float]] = {}
+        # Guards the caches, which are filled from worker threads
+        self._lock = threading.Lock()
+        # Held while a section is fetched, so concurrent callers wait for one download
+        self._load_locks = {section: threading.Lock() for section in _CACHE_SECTIONS}
+        # When each section was fetched from the API (kept when loaded from disk)
+        self._saved_at: Dict[str, float] = {}
+        self._cache_file = cache_file
+        self._load_disk_cache()
+
+    def _set_lines_cache(self, lines_cache: Dict[str, Dict[str, Any]]):
+        """Store lines with their normalized names (caller holds the lock)."""
+        self._lines_cache = lines_cache
+        meta = list(lines_cache.values())
+        self._lines_index = {
+            "names": [normalize_text(li.get("line_name", "")) for li in meta],
+            "codes": [normalize_text(li.get("line_code", "")) for li in meta],
+            "dests": [normalize_text(li.get("dest_name", "")) for li in meta],
+            "meta": meta,
+        }
+        self._lines_by_code_norm = {}
+        for code, li in zip(self._lines_index["codes"], meta):
+            if code:
+                self._lines_by_code_norm.setdefault(code, li)
+
+    def _section_data(self, section: str) -> Any:
+        """Cached data of a snapshot section (caller holds the lock)."""
+        return self._lines_cache if section == "lines" else self._stop_points
+
+    def _store_section(self, section: str, data: Any, saved_at: float):
+        """Store the data of a snapshot section (caller holds the lock)."""
+        if section == "lines":
+            self._set_lines_cache(data)
+        else:
+            self._stop_points = data
+        self._saved_at[section] = saved_at
+
+    def _load_section(self, section: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Fetch a section from the API unless cached; concurrent callers wait for the same request.
+        This is the only place writing the disk snapshot, once per fetched section, in the background.
+        """
+        with self._load_locks[section]:
+            with self._lock:
+                data = self._section_data(section)
+            if data:
+                return data
+            data = fetch()
+            with self._lock:
+                self._store_section(section, data, time.time())
+        if self._cache_file:
+            _SNAPSHOT_EXECUTOR.submit(self._save_disk_cache)
+        return data
+
+    def _load_disk_cache(self):
+        """Load the lines/stop points caches from disk, each section if fetched recently enough."""
+        if not self._cache_file:
+            return
+        try:
+            with open(self._cache_file, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        with self._lock:
+            for section in _CACHE_SECTIONS:
+                entry = snapshot.get(section)
+                if not isinstance(entry, dict) or not entry.get("data"):
+                    continue
+                saved_at = entry.get("saved_at") or 0
+                if now - saved_at <= CACHE_TTL:
+                    self._store_section(section, entry["data"], saved_at)
 
-    def _get(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _save_disk_cache(self):
+        """
+        Write the lines/stop points caches to disk, with the time each section was fetched.
+        Runs on _SNAPSHOT_EXECUTOR, which also keeps writes from overlapping.
+        """
+        with self._lock:
+            snapshot = {
+                section: {"saved_at": self._saved_at[section], "data": self._section_data(section)}
+                for section in _CACHE_SECTIONS
+                if section in self._saved_at
+            }
+        # Write to a temporary file then rename, so readers never see a partial file
+        tmp_file = f"{self._cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_file, self._cache_file)
+        except OSError as e:
+            logger.warning(f"Could not save cache: {e}")
+
+    def _get(
+        self, endpoint: str, params: Dict[str, Any], timeout: Tuple[float, float] = MONITORING_TIMEOUT
+    ) -> Dict[str, Any]:
         """Make GET request to API."""
         params["AccountKey"] = self._key
         url = f"{self._base}/{endpoint}"
-        response = self._session.get(url, params=params, timeout=20)
+        response = self._session.get(url, params=params, timeout=timeout)
         response.raise_for_status()
+        if orjson is not None:
+            return orjson.loads(response.content)
         return response.json()
 
     def get_lines(self) -> Dict[str, Dict[str, Any]]:
         """Get all available lines with their destinations."""
-        if self._lines_cache:
-            return self._lines_cache
-
-        data = self._get("lines-discovery.json", {})
-        items = (
-            data.get("Siri", {})
-            .get("LinesDelivery", {})
-            .get("AnnotatedLineRef", [])
-        )
+        with self._lock:
+            if self._lines_cache:
+                return self._lines_cache
+        return self._load_section("lines", self._fetch_lines)
+
+    def _fetch_lines(self) -> Dict[str, Dict[str, Any]]:
+        """Download lines with their destinations, keyed by "{line_ref}-{direction_ref}"."""
+        data = self._get("lines-discovery.json", {}, timeout=DISCOVERY_TIMEOUT)
+        items = _dig(data, _LINES_PATH, [])
 
         found_lines: Dict[str, Dict[str, Any]] = {}
         for it in items or []:
@@ -175,19 +413,31 @@ class TBMClient:
                     }
 
         # Sort by line name
-        self._lines_cache = dict(
+        return dict(
             sorted(found_lines.items(), key=lambda kv: kv[1].get("line_name", ""))
         )
-        return self._lines_cache
-
-    def get_stops_for_line(
-        self, line_ref: str, direction_ref: int, bbox: Tuple[float, float, float, float] = BBOX
-    ) -> List[Dict[str, Any]]:
-        """Get all stops for a specific line and direction."""
-        cache_key = f"{line_ref}-{direction_ref}"
-        if cache_key in self._stops_cache:
-            return self._stops_cache[cache_key]
 
+    @property
+    def lines_loaded(self) -> bool:
+        """Whether the lines index is in memory (line lookups then need no API call)."""
+        return bool(self._lines_cache)
+
+    def warmup(self):
+        """Load the lines index ahead of the first search (opens the pooled connection on a cold cache)."""
+        try:
+            self.get_lines()
+        except requests.RequestException as e:
+            logger.debug(f"TBM warmup failed: {e}")
+
+    def _get_stop_points(self) -> List[Dict[str, Any]]:
+        """Get all stops of the area with the lines serving them (downloaded once)."""
+        with self._lock:
+            if self._stop_points:
+                return self._stop_points
+        return self._load_section("stop_points", self._fetch_stop_points)
+
+    def _fetch_stop_points(self, bbox: Tuple[float, float, float, float] = BBOX) -> List[Dict[str, Any]]:
+        """Download all stops of the bbox area with the lines serving them."""
         W, N, E, S = bbox
         params = {
             "BoundingBox.UpperLeft.longitude": W,
@@ -196,38 +446,74 @@ class TBMClient:
             "BoundingBox.LowerRight.latitude": S,
         }
 
-        data = self._get("stoppoints-discovery.json", params)
-        items = (
-            data.get("Siri", {})
-            .get("StopPointsDelivery", {})
-            .get("AnnotatedStopPointRef", [])
-        )
+        data = self._get("stoppoints-discovery.json", params, timeout=DISCOVERY_TIMEOUT)
+        items = _dig(data, _STOP_POINTS_PATH, [])
+
+        stop_points = [
+            {
+                "stop_name": get_value(it.get("StopName")),
+                "stop_point_ref": get_value(it.get("StopPointRef")),
+                "lines": [get_value(l) for l in it.get("Lines") or []],
+            }
+            for it in items or []
+        ]
+        # Sort by stop name (per-line lists keep this order)
+        stop_points.sort(key=lambda x: normalize_text(x.get("stop_name", "")))
+        return stop_points
 
-        results = []
-        for it in items or []:
-            stop_name = get_value(it.get("StopName"))
-            stop_point_ref = get_value(it.get("StopPointRef"))
-            lines = it.get("Lines") or []
-
-            for l in lines:
-                if get_value(l) == line_ref:
-                    # Check if this stop has departures in the right direction
-                    departures = self.get_departures(
-                        stop_point_ref, line_ref, direction_ref, max_visits=1
-                    )
-                    if departures:
-                        results.append({
-                            "stop_name": stop_name,
-                            "stop_point_ref": stop_point_ref,
-                            "direction_ref": direction_ref,
-                        })
-                    break
-
-        # Sort by stop name
-        results.sort(key=lambda x: normalize_text(x.get("stop_name", "")))
-        self._stops_cache[cache_key] = results
+    def get_stops_for_line(
+        self, line_ref: str, direction_ref: int, bbox: Tuple[float, float, float, float] = BBOX
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all stops served by a line, filtered from the shared stop list of the BBOX area
+        (another bbox downloads its own stop list, not cached).
+        Direction is not checked here (it costs one API call per stop), see serves_direction.
+        """
+        default_area = tuple(bbox) == BBOX
+        cache_key = f"{line_ref}-{direction_ref}"
+        if default_area:
+            with self._lock:
+                if cache_key in self._stops_cache:
+                    return self._stops_cache[cache_key]
+
+        stop_points = self._get_stop_points() if default_area else self._fetch_stop_points(bbox)
+        results = [
+            {
+                "stop_name": sp["stop_name"],
+                "stop_point_ref": sp["stop_point_ref"],
+                "direction_ref": direction_ref,
+            }
+            for sp in stop_points
+            if line_ref in sp["lines"]
+        ]
+        if default_area:
+            with self._lock:
+                self._stops_cache[cache_key] = results
         return results
 
+    def _cached_direction(self, cache_key: Tuple[str, str, int]) -> Optional[bool]:
+        """Remembered serves_direction result, None if unknown or expired."""
+        with self._lock:
+            cached = self._direction_stops_cache.get(cache_key)
+        if cached and (cached[0] or time.time() - cached[1] < DIRECTION_MISS_TTL):
+            return cached[0]
+        return None
+
+    def serves_direction(self, stop_point_ref: str, line_ref: str, direction_ref: int) -> bool:
+        """
+        Check if a stop has upcoming departures for a line in the given direction (-1: any).
+        A stop found served is remembered; one without departures is checked again after DIRECTION_MISS_TTL.
+        """
+        cache_key = (stop_point_ref, line_ref, direction_ref)
+        cached = self._cached_direction(cache_key)
+        if cached is not None:
+            return cached
+
+        served = bool(self.get_departures(stop_point_ref, line_ref, direction_ref, max_visits=1))
+        with self._lock:
+            self._direction_stops_cache[cache_key] = (served, time.time())
+        return served
+
     def get_departures(
         self,
         stop_point_ref: str,
@@ -244,15 +530,11 @@ class TBMClient:
         }
         if line_ref:
             params["LineRef"] = line_ref
-        if direction_ref != -1:
+        if direction_ref is not None and direction_ref != -1:
             params["DirectionRef"] = direction_ref
 
         data = self._get("stop-monitoring.json", params)
-        deliveries = (
-            data.get("Siri", {})
-            .get("ServiceDelivery", {})
-            .get("StopMonitoringDelivery", [])
-        )
+        deliveries = _dig(data, _STOP_MONITORING_PATH, [])
 
         visits: List[Dict[str, Any]] = []
         for d in deliveries:
@@ -287,28 +569,45 @@ class TBMClient:
         Search for stops matching the query with fuzzy matching.
         Handles: "40 journaux" = "quarante journaux", "pyrénées" matches any direction with pyrénées.
         """
-        results = []
-        lines = self.get_lines()
+        return self.served_stops(self.rank_stops(stop_query, line_query, dest_query))
+
+    def rank_stops(
+        self,
+        stop_query: Optional[str] = None,
+        line_query: Optional[str] = None,
+        dest_query: Optional[str] = None,
+    ) -> List[Tuple[Optional[str], Optional[str], Dict[str, Any]]]:
+        """
+        Stops matching the query, best first, as (stop_point_ref, stop_name, line_info) rows.
+        Only uses the line and stop lists: whether a stop is served is checked by served_stops.
+        Without stop query, the single row is the first matching line with no stop.
+        """
+        self.get_lines()
+        index = self._lines_index
+
+        # Normalize queries once so repeated fuzzy_match calls hit its cache
+        stop_query_norm = normalize_text(stop_query)
+        line_query_norm = normalize_text(line_query)
+        dest_query_norm = normalize_text(dest_query)
 
         # Filter lines by line query and/or destination query
         matching_lines = []
-        for key, line_info in lines.items():
-            line_name = line_info.get("line_name", "")
-            line_code = line_info.get("line_code", "")
-            dest_name = line_info.get("dest_name", "")
+        for line_name, line_code, dest_name, line_info in zip(
+            index["names"], index["codes"], index["dests"], index["meta"]
+        ):
 
             # If line query specified, filter by line (fuzzy)
             if line_query:
                 line_score = max(
-                    fuzzy_match(line_query, line_name),
-                    fuzzy_match(line_query, line_code)
+                    fuzzy_match(line_query_norm, line_name),
+                    fuzzy_match(line_query_norm, line_code)
                 )
                 if line_score < 0.5:
                     continue
 
             # If destination query specified, filter by destination (fuzzy)
             if dest_query:
-                dest_score = fuzzy_match(dest_query, dest_name)
+                dest_score = fuzzy_match(dest_query_norm, dest_name)
                 if dest_score < 0.3:  # Lower threshold - "pyrénées" should match
                     continue
 
@@ -316,69 +615,88 @@ class TBMClient:
 
         # If no stop query, return lines only (no stop info)
         if not stop_query:
-            if matching_lines:
-                line = matching_lines[0]
-                return [{
-                    "line_ref": line.get("line_ref"),
-                    "line_name": line.get("line_name"),
-                    "line_code": line.get("line_code"),
-                    "direction_ref": line.get("direction_ref"),
-                    "dest_name": line.get("dest_name"),
-                    "stop_point_ref": None,
-                    "stop_name": None,
-                }]
-            return []
+            return [(None, None, matching_lines[0])] if matching_lines else []
 
         # Search stops for matching lines with fuzzy matching
         scored_results = []
-        for line_info in matching_lines[:5]:  # Limit to avoid too many API calls
-            line_ref = line_info.get("line_ref")
-            direction_ref = line_info.get("direction_ref", -1)
-
-            stops = self.get_stops_for_line(line_ref, direction_ref)
-            
+        for line_info in matching_lines[:5]:  # Limit the direction checks in served_stops
+            stops = self.get_stops_for_line(line_info.get("line_ref"), line_info.get("direction_ref", -1))
             for stop in stops:
                 stop_name = stop.get("stop_name", "")
                 
                 # Fuzzy match stop name
-                score = fuzzy_match(stop_query, stop_name)
+                score = fuzzy_match(stop_query_norm, stop_name)
                 
                 if score >= 0.3:  # Threshold for match
-                    scored_results.append({
-                        "score": score,
-                        "stop_point_ref": stop.get("stop_point_ref"),
-                        "stop_name": stop_name,
-                        "line_ref": line_ref,
-                        "line_name": line_info.get("line_name"),
-                        "line_code": line_info.get("line_code"),
-                        "direction_ref": direction_ref,
-                        "dest_name": line_info.get("dest_name"),
-                    })
+                    scored_results.append((score, stop.get("stop_point_ref"), stop_name, line_info))
 
-        # Sort by score (best match first)
-        scored_results.sort(key=lambda x: -x["score"])
-        
-        # Remove score from results
-        for r in scored_results:
-            r.pop("score", None)
-            results.append(r)
+        # Sort by score (best match first, stable for ties)
+        scored_results.sort(key=itemgetter(0), reverse=True)
+        return [r[1:] for r in scored_results]
 
-        return results[:10]  # Return top 10 matches
+    def served_stops(
+        self, ranked: Sequence[Tuple[Optional[str], Optional[str], Dict[str, Any]]], limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Keep the first `limit` ranked stops (see rank_stops) with departures in their direction.
+        Unknown stops cost one API call each (see serves_direction), so check them in rank order,
+        a batch of at most the missing count at a time, and stop at `limit`. Only the stops
+        not remembered by serves_direction go to the worker threads.
+        """
+        top = []
+        i = 0
+        while i < len(ranked) and len(top) < limit:
+            batch = ranked[i:i + min(limit - len(top), MAX_WORKERS)]
+            i += len(batch)
+            keys = [
+                None if r[0] is None else (r[0], r[2].get("line_ref"), r[2].get("direction_ref", -1))
+                for r in batch
+            ]
+            served = [True if key is None else self._cached_direction(key) for key in keys]
+            misses = [j for j, ok in enumerate(served) if ok is None]
+            if len(misses) == 1:
+                served[misses[0]] = self.serves_direction(*keys[misses[0]])
+            elif misses:
+                futures = [(j, _DIRECTION_EXECUTOR.submit(self.serves_direction, *keys[j])) for j in misses]
+                for j, future in futures:
+                    served[j] = future.result()
+            top.extend(r for r, ok in zip(batch, served) if ok)
+
+        # Result dicts are built for the kept rows only
+        return [
+            {
+                "stop_point_ref": stop_point_ref,
+                "stop_name": stop_name,
+                "line_ref": line_info.get("line_ref"),
+                "line_name": line_info.get("line_name"),
+                "line_code": line_info.get("line_code"),
+                "direction_ref": line_info.get("direction_ref", -1),
+                "dest_name": line_info.get("dest_name"),
+            }
+            for stop_point_ref, stop_name, line_info in top
+        ]
 
     def find_line_by_query(self, query: str) -> Optional[Dict[str, Any]]:
         """Find a line by name or code with fuzzy matching."""
-        lines = self.get_lines()
+        self.get_lines()
+
+        # Exact line code ("C", "40"...) is the common case
+        hit = self._lines_by_code_norm.get(normalize_text(query))
+        if hit:
+            return hit
+
+        index = self._lines_index
         best_match = None
         best_score = 0.0
 
-        for key, line_info in lines.items():
-            line_name = line_info.get("line_name", "")
-            line_code = line_info.get("line_code", "")
+        for line_name, line_code, line_info in zip(index["names"], index["codes"], index["meta"]):
 
             score = max(
                 fuzzy_match(query, line_name),
                 fuzzy_match(query, line_code)
             )
+            if score >= 1.0:
+                return line_info
             
             if score > best_score:
                 best_score = score
@@ -4,40 +4,136 @@ TBM Horaires - Alexa Skill
 Horaires temps réel des transports TBM Bordeaux Métropole
 """
 
+import calendar
+import functools
+import json
 import logging
 import os
-from datetime import datetime, timezone
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Optional, Tuple
 
 from ask_sdk_core.skill_builder import CustomSkillBuilder
 from ask_sdk_core.dispatch_components import (
     AbstractRequestHandler,
     AbstractExceptionHandler,
 )
-from ask_sdk_core.utils import is_request_type, is_intent_name, get_slot_value
+from ask_sdk_core.utils import get_slot_value
+from ask_sdk_core.attributes_manager import AbstractPersistenceAdapter
+from ask_sdk_core.exceptions import AttributesManagerException, PersistenceException
 from ask_sdk_core.handler_input import HandlerInput
-from ask_sdk_model import Response
-from ask_sdk_dynamodb.adapter import DynamoDbAdapter
+from ask_sdk_core.response_helper import ResponseFactory
+from ask_sdk_model import RequestEnvelope, Response
 
-from api import TBMClient
+from api import DIRECTION_MISS_TTL, TBMClient, normalize_text
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+# Verbose logs only when asked for (TBM_DEBUG=1): CloudWatch ingestion costs time and money
+logger.setLevel(logging.DEBUG if os.environ.get("TBM_DEBUG") == "1" else logging.INFO)
+logging.getLogger("botocore").setLevel(logging.WARNING)
+logging.getLogger("urllib3").setLevel(logging.WARNING)
 
-# DynamoDB for persistence (optional - uses session if not available)
+# DynamoDB for persistence (optional - TBM_PERSISTENCE=0 keeps the stop in the session only).
+# boto3 and the DynamoDB adapter are only imported when persistence is enabled.
 ddb_region = os.environ.get("DYNAMODB_REGION", "eu-west-1")
 ddb_table = os.environ.get("DYNAMODB_TABLE", "tbm-horaires-users")
+_HAS_PERSISTENCE = os.environ.get("TBM_PERSISTENCE") != "0"
+if not _HAS_PERSISTENCE:
+    logger.warning("Persistence disabled (TBM_PERSISTENCE=0): favorite stops are kept for the session only")
 
-try:
-    from ask_sdk_dynamodb.adapter import DynamoDbAdapter
-    import boto3
-    ddb_resource = boto3.resource("dynamodb", region_name=ddb_region)
-    dynamodb_adapter = DynamoDbAdapter(table_name=ddb_table, create_table=False, dynamodb_resource=ddb_resource)
-except Exception:
-    dynamodb_adapter = None
 
-# Initialize API client
-tbm_client = TBMClient()
+# The warmup threads and the handler can ask for the shared clients at the same time:
+# build each one under a lock so that only one instance is ever created
+_DDB_BUILD_LOCK = threading.Lock()
+_TBM_BUILD_LOCK = threading.Lock()
+
+
+def get_dynamodb_adapter() -> Optional[AbstractPersistenceAdapter]:
+    """Build the DynamoDB adapter on first use (None if DynamoDB is not available)."""
+    with _DDB_BUILD_LOCK:
+        return _build_dynamodb_adapter()
+
+
+@functools.lru_cache(maxsize=1)
+def _build_dynamodb_adapter() -> Optional[AbstractPersistenceAdapter]:
+    if not _HAS_PERSISTENCE:
+        return None
+    try:
+        import boto3
+        from botocore.config import Config
+        from ask_sdk_dynamodb.adapter import DynamoDbAdapter
+
+        # Keep the HTTPS connection to DynamoDB alive across warm invocations, and fail
+        # fast (session fallback) rather than stall the voice response on a slow endpoint
+        ddb_config = Config(
+            tcp_keepalive=True,
+            connect_timeout=1,
+            read_timeout=2,
+            max_pool_connections=10,
+            retries={"max_attempts": 2, "mode": "standard"},
+        )
+        ddb_resource = boto3.resource("dynamodb", region_name=ddb_region, config=ddb_config)
+        return DynamoDbAdapter(table_name=ddb_table, create_table=False, dynamodb_resource=ddb_resource)
+    except Exception as e:
+        logger.warning(f"DynamoDB not available, favorite stops are kept for the session only: {e}")
+        return None
+
+
+def prime_dynamodb():
+    """Open the DynamoDB connection (TLS handshake, endpoint resolution) ahead of the first read."""
+    adapter = get_dynamodb_adapter()
+    if adapter is None:
+        return
+    try:
+        adapter.dynamodb.meta.client.describe_endpoints()
+    except Exception as e:
+        logger.debug(f"DynamoDB priming failed: {e}")
+
+
+def get_tbm_client() -> TBMClient:
+    """Build the API client on first use (shared across warm invocations)."""
+    with _TBM_BUILD_LOCK:
+        return _build_tbm_client()
+
+
+@functools.lru_cache(maxsize=1)
+def _build_tbm_client() -> TBMClient:
+    return TBMClient()
+
+
+class LazyPersistenceAdapter(AbstractPersistenceAdapter):
+    """Persistence adapter deferring DynamoDB setup to the first attribute access."""
+
+    def _adapter(self) -> AbstractPersistenceAdapter:
+        adapter = get_dynamodb_adapter()
+        if adapter is None:
+            raise PersistenceException("DynamoDB is not available")
+        return adapter
+
+    def get_attributes(self, request_envelope):
+        return self._adapter().get_attributes(request_envelope)
+
+    def save_attributes(self, request_envelope, attributes):
+        self._adapter().save_attributes(request_envelope, attributes)
+
+    def delete_attributes(self, request_envelope):
+        self._adapter().delete_attributes(request_envelope)
+
+
+# Worker threads for API calls overlapped with other work in a handler
+_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+# Separate threads for the cold start warmup, so its slow calls never queue ahead of handler work
+_WARMUP_EXECUTOR = ThreadPoolExecutor(max_workers=3)
+
+# Persistent attributes per user id, reused across warm invocations, oldest write first.
+# The warmup threads can read attributes while a handler runs, so access holds the lock.
+ATTR_CACHE_TTL = 60  # seconds
+ATTR_CACHE_MAXSIZE = 256
+_ATTR_CACHE: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_ATTR_CACHE_LOCK = threading.Lock()
 
 # Default stop configuration (can be changed by user)
 DEFAULT_CONFIG = {
@@ -46,26 +142,226 @@ DEFAULT_CONFIG = {
     "dest_name": "Les Pyrénées",
 }
 
+# Resolved DEFAULT_CONFIG stop, set on first successful lookup (read-only for callers),
+# and the pending background lookup started by the cold start warmup
+_DEFAULT_CACHED: Optional[dict] = None
+_DEFAULT_FUTURE: Optional[Future] = None
+# Last _DEFAULT_CACHED lookup: the best stop may have had no departures then, so look again
+# as often as the stops found without departures are checked again
+_DEFAULT_CHECKED_AT = 0.0
+DEFAULT_CONFIG_TTL = DIRECTION_MISS_TTL
+
+# Stop config as read by the handlers (see unpack_config)
+StopConfig = namedtuple(
+    "StopConfig",
+    ("stop_point_ref", "line_ref", "direction_ref", "stop_name", "line_name", "dest_name", "is_default"),
+    defaults=(None, None, -1, None, None, None, False),
+)
+# Stop config keys with their defaults, in StopConfig order
+STOP_CONFIG_DEFAULTS = tuple(zip(StopConfig._fields, StopConfig()))
+
+# Fixed speech texts
+LAUNCH_SUFFIX = "Dites 'prochain passage' ou 'changer d'arrêt'."
+CLEAR_SPEECH = "J'ai supprimé votre arrêt. Dites 'enregistre l'arrêt' pour en configurer un nouveau."
+CHANGE_STOP_SPEECH = "D'accord. Quel arrêt ? Dites 'enregistre l'arrêt' suivi du nom."
+LIST_LINES_SPEECH = (
+    "Les lignes TBM : trams A, B, C, D. "
+    "Bus Lianes 1 à 16. Et le Batcub. "
+    "Pour configurer, dites 'enregistre l'arrêt' suivi du nom."
+)
+HELP_SPEECH = (
+    "Je donne les horaires TBM en temps réel. "
+    "Dites 'enregistre l'arrêt' suivi du nom pour configurer. "
+    "Puis 'prochain passage' pour les horaires."
+)
+CANCEL_SPEECH = "À bientôt !"
+FALLBACK_SPEECH = "Je n'ai pas compris. Dites 'prochain passage' ou 'aide'."
+CONFIG_ERROR_SPEECH = "Erreur de configuration. Dites 'enregistre l'arrêt' pour configurer."
+API_ERROR_SPEECH = "Désolé, je n'ai pas pu récupérer les horaires. Réessayez dans quelques instants."
+STOP_NOT_UNDERSTOOD_SPEECH = "Je n'ai pas compris le nom de l'arrêt. Pouvez-vous répéter ?"
+LINE_NOT_UNDERSTOOD_SPEECH = "Je n'ai pas compris la ligne. Dites par exemple 'tram C' ou 'liane 1'."
+MISSING_INFO_SPEECH = (
+    "Je n'ai pas toutes les informations. "
+    "Recommencez en disant 'enregistre l'arrêt' suivi du nom."
+)
+ERROR_SPEECH = "Désolé, une erreur s'est produite. Réessayez."
+SAVED_STOP_SUFFIX = ". Dites 'prochain passage' pour les horaires."
+GET_FAVORITE_SUFFIX = ". Dites 'changer d'arrêt' pour modifier."
+
+# Speech templates (str.format)
+WELCOME_DEFAULT_SPEECH = "Bienvenue. Arrêt par défaut : {stop}, {line}. " + LAUNCH_SUFFIX
+WELCOME_SAVED_SPEECH = "Bienvenue. Votre arrêt : {stop}, {line}. " + LAUNCH_SUFFIX
+NO_DEPARTURE_SPEECH = "Pas de passage prévu pour {line} à {stop}."
+NEXT_DEPARTURE_SPEECH = "{line}{dest} {when}."
+NEXT_DEPARTURES_SPEECH = "{line}{dest} : dans {times}."
+SET_STOP_SPEECH = "D'accord, l'arrêt {stop}. Quelle ligne ? Par exemple 'tram C' ou 'liane 1'."
+SET_LINE_EXAMPLE_SPEECH = "Ligne {line}. Quelle direction ? Par exemple 'direction {dest}' ou dites 'n'importe'."
+SET_LINE_SPEECH = "Ligne {line}. Quelle direction ?"
+STOP_NOT_FOUND_SPEECH = "Je n'ai pas trouvé l'arrêt {stop} pour la ligne {line}. Essayez avec un autre nom."
+SAVED_STOP_SPEECH = "Parfait ! Arrêt {stop}, ligne {line}"
+DEFAULT_STOP_SPEECH = "Arrêt par défaut : {stop}, {line}"
+YOUR_STOP_SPEECH = "Votre arrêt : {stop}, {line}"
+DIRECTION_SPEECH = " direction {dest}"
+
+# Terminal responses never change, so build them once (nothing mutates a Response after handle)
+_EMPTY_RESPONSE = ResponseFactory().response
+_CANCEL_RESPONSE = ResponseFactory().speak(CANCEL_SPEECH).response
+
+
+def _parse_epoch(iso_ts: str) -> Optional[int]:
+    """Parse an ISO timestamp (YYYY-MM-DDTHH:MM:SS[.fff] then Z or +HH:MM) to epoch seconds.
+
+    Returns None, without raising, when the timestamp does not have that shape
+    or a field is out of range.
+    """
+    date_digits = iso_ts[0:4] + iso_ts[5:7] + iso_ts[8:10] + iso_ts[11:13] + iso_ts[14:16] + iso_ts[17:19]
+    if (len(date_digits) != 14 or not (date_digits.isascii() and date_digits.isdigit())
+            or iso_ts[4] != "-" or iso_ts[7] != "-" or iso_ts[10] != "T"
+            or iso_ts[13] != ":" or iso_ts[16] != ":"):
+        return None
+    year, month, day = int(iso_ts[0:4]), int(iso_ts[5:7]), int(iso_ts[8:10])
+    hour, minute, second = int(iso_ts[11:13]), int(iso_ts[14:16]), int(iso_ts[17:19])
+    if (year < 1 or not 1 <= month <= 12 or not 1 <= day <= calendar.monthrange(year, month)[1]
+            or hour > 23 or minute > 59 or second > 59):
+        return None
+    ts = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+
+    tz = iso_ts[19:]
+    if tz[:1] == ".":  # Skip fractional seconds (at least one digit)
+        fraction = tz[1:]
+        tz = fraction.lstrip("0123456789")
+        if len(tz) == len(fraction):
+            return None
+    if tz == "Z":
+        return ts
+    offset_digits = tz[1:3] + tz[-2:]
+    if (len(tz) not in (5, 6) or tz[0] not in "+-" or (len(tz) == 6 and tz[3] != ":")
+            or not (offset_digits.isascii() and offset_digits.isdigit())):
+        return None
+    offset = int(tz[1:3]) * 3600 + int(tz[-2:]) * 60
+    return ts - offset if tz[0] == "+" else ts + offset
+
 
-def _mins_to(iso_ts: Optional[str]) -> Optional[int]:
-    """Convert ISO timestamp to minutes from now."""
-    if not iso_ts:
+def _mins_to(iso_ts: Optional[str], now_ts: float) -> Optional[int]:
+    """Convert ISO timestamp to minutes from now_ts (epoch seconds)."""
+    if not iso_ts or not isinstance(iso_ts, str):
+        return None
+    epoch = _parse_epoch(iso_ts)
+    if epoch is None:
+        logger.warning(f"Unreadable departure time: {iso_ts}")
         return None
+    return max(0, int((epoch - now_ts) // 60))
+
+
+_MINS_WORDS = {0: "maintenant", 1: "1 minute"}
+
+
+def _format_mins(mins: int) -> str:
+    """Speak a number of minutes ("maintenant", "1 minute", "5 minutes")."""
+    return _MINS_WORDS.get(mins) or f"{mins} minutes"
+
+
+def _user_id(handler_input: HandlerInput) -> Optional[str]:
+    """Get the Alexa user id of the request."""
     try:
-        dt = datetime.fromisoformat(iso_ts.replace("Z", "+00:00"))
-        return max(0, int((dt - datetime.now(timezone.utc)).total_seconds() // 60))
-    except Exception:
+        return handler_input.request_envelope.context.system.user.user_id
+    except AttributeError:
         return None
 
 
-def get_persistent_attributes(handler_input: HandlerInput) -> dict:
-    """Get user preferences from persistence or session."""
+def _attr_cache_get(user_id: str) -> Optional[dict]:
+    """Cached persistent attributes of a user, None if not cached or expired."""
+    with _ATTR_CACHE_LOCK:
+        cached = _ATTR_CACHE.get(user_id)
+    if cached and time.time() - cached[0] < ATTR_CACHE_TTL:
+        return cached[1]
+    return None
+
+
+def _attr_cache_put(user_id: str, attrs: dict):
+    """Cache the persistent attributes of a user, dropping expired and oldest entries."""
+    now = time.time()
+    with _ATTR_CACHE_LOCK:
+        _ATTR_CACHE.pop(user_id, None)
+        # Entries are in write order, so the expired ones are at the front
+        while _ATTR_CACHE:
+            oldest_at = next(iter(_ATTR_CACHE.values()))[0]
+            if len(_ATTR_CACHE) < ATTR_CACHE_MAXSIZE and now - oldest_at < ATTR_CACHE_TTL:
+                break
+            _ATTR_CACHE.popitem(last=False)
+        _ATTR_CACHE[user_id] = (now, attrs)
+
+
+def _attr_cache_drop(user_id: str):
+    """Forget the cached persistent attributes of a user."""
+    with _ATTR_CACHE_LOCK:
+        _ATTR_CACHE.pop(user_id, None)
+
+
+class _NoMatch(Exception):
+    """Raised inside the search memos so that empty results are not cached."""
+
+
+@functools.lru_cache(maxsize=512)
+def _rank_stops_memo(stop_query: Optional[str], line_query: Optional[str],
+                     dest_query: Optional[str]) -> tuple:
+    ranked = get_tbm_client().rank_stops(
+        stop_query=stop_query, line_query=line_query, dest_query=dest_query
+    )
+    if not ranked:
+        raise _NoMatch
+    return tuple(ranked)
+
+
+@functools.lru_cache(maxsize=64)
+def _find_line_memo(line_query: str) -> MappingProxyType:
+    line_info = get_tbm_client().find_line_by_query(line_query)
+    if not line_info:
+        raise _NoMatch
+    return MappingProxyType(line_info)
+
+
+def find_line_cached(line_query: str) -> Optional[MappingProxyType]:
+    """Find a line, memoized on the (normalized) query across warm invocations."""
     try:
-        attrs = handler_input.attributes_manager.persistent_attributes
-        if attrs:
-            return attrs
-    except Exception:
-        pass
+        return _find_line_memo(line_query)
+    except _NoMatch:
+        return None
+
+
+def search_stop_cached(stop_query: Optional[str], line_query: Optional[str],
+                       dest_query: Optional[str]) -> tuple:
+    """Search stops, the ranking memoized on the (normalized) queries across warm invocations.
+
+    Whether a stop is served is checked on each call: TBMClient remembers served stops
+    and checks the others again after DIRECTION_MISS_TTL.
+    """
+    try:
+        ranked = _rank_stops_memo(stop_query, line_query, dest_query)
+    except _NoMatch:
+        return ()
+    return tuple(get_tbm_client().served_stops(ranked))
+
+
+def get_persistent_attributes(handler_input: HandlerInput) -> dict:
+    """Get user preferences from persistence (cached per user) or session."""
+    if not _HAS_PERSISTENCE:
+        return handler_input.attributes_manager.session_attributes or {}
+
+    user_id = _user_id(handler_input)
+    cached = _attr_cache_get(user_id) if user_id else None
+    if cached is not None:
+        if cached:
+            return cached
+    elif get_dynamodb_adapter() is not None:
+        try:
+            attrs = handler_input.attributes_manager.persistent_attributes
+            if user_id:
+                _attr_cache_put(user_id, attrs)
+            if attrs:
+                return attrs
+        except (PersistenceException, AttributesManagerException) as e:
+            logger.warning(f"Could not read persistent attributes: {e}")
     
     session_attrs = handler_input.attributes_manager.session_attributes or {}
     if session_attrs:
@@ -74,40 +370,99 @@ def get_persistent_attributes(handler_input: HandlerInput) -> dict:
     return {}
 
 
+def _resolve_default_config() -> Optional[dict]:
+    """Search the DEFAULT_CONFIG stop and keep it in _DEFAULT_CACHED (previous value if not found)."""
+    global _DEFAULT_CACHED, _DEFAULT_CHECKED_AT
+    search_results = search_stop_cached(
+        normalize_slot(DEFAULT_CONFIG["stop_name"]),
+        normalize_slot(DEFAULT_CONFIG["line_name"]),
+        normalize_slot(DEFAULT_CONFIG["dest_name"]),
+    )
+    if search_results:
+        result = search_results[0]
+        _DEFAULT_CACHED = {
+            "stop_point_ref": result.get("stop_point_ref"),
+            "stop_name": result.get("stop_name") or DEFAULT_CONFIG["stop_name"],
+            "line_ref": result.get("line_ref"),
+            "line_name": result.get("line_name") or DEFAULT_CONFIG["line_name"],
+            "direction_ref": result.get("direction_ref"),
+            "dest_name": result.get("dest_name") or DEFAULT_CONFIG["dest_name"],
+            "is_default": True,
+        }
+    _DEFAULT_CHECKED_AT = time.time()
+    return _DEFAULT_CACHED
+
+
+def prefetch_default_config():
+    """Start resolving the default stop in the background (picked up by get_config_or_default)."""
+    global _DEFAULT_FUTURE
+    if _DEFAULT_CACHED is None and _DEFAULT_FUTURE is None:
+        _DEFAULT_FUTURE = _WARMUP_EXECUTOR.submit(_resolve_default_config)
+
+
 def get_config_or_default(handler_input: HandlerInput) -> dict:
     """Get user config or initialize with default if none exists."""
+    global _DEFAULT_FUTURE
     attrs = get_persistent_attributes(handler_input)
     
-    # If no config saved, search and cache the default
+    # If no config saved, use the default (resolved once, possibly by the warmup prefetch)
     if not attrs.get("stop_point_ref"):
-        # Search for default stop
-        search_results = tbm_client.search_stop(
-            stop_query=DEFAULT_CONFIG["stop_name"],
-            line_query=DEFAULT_CONFIG["line_name"],
-            dest_query=DEFAULT_CONFIG["dest_name"]
-        )
-        if search_results:
-            result = search_results[0]
-            attrs = {
-                "stop_point_ref": result.get("stop_point_ref"),
-                "stop_name": result.get("stop_name") or DEFAULT_CONFIG["stop_name"],
-                "line_ref": result.get("line_ref"),
-                "line_name": result.get("line_name") or DEFAULT_CONFIG["line_name"],
-                "direction_ref": result.get("direction_ref"),
-                "dest_name": result.get("dest_name") or DEFAULT_CONFIG["dest_name"],
-                "is_default": True,
-            }
+        if _DEFAULT_CACHED is not None:
+            if time.time() - _DEFAULT_CHECKED_AT >= DEFAULT_CONFIG_TTL:
+                try:
+                    _resolve_default_config()
+                except Exception as e:
+                    logger.warning(f"Default stop refresh failed: {e}")
+            return _DEFAULT_CACHED
+        future, _DEFAULT_FUTURE = _DEFAULT_FUTURE, None
+        if future is not None:
+            try:
+                default = future.result()
+            except Exception as e:
+                logger.warning(f"Default stop prefetch failed: {e}")
+                default = _resolve_default_config()
+        else:
+            default = _resolve_default_config()
+        if default:
+            return default
     
     return attrs
 
 
+def normalize_slot(value: Optional[str]) -> Optional[str]:
+    """Normalize a slot value once before querying the API (same form the API matches on)."""
+    return normalize_text(value) if value else None
+
+
+def unpack_config(attrs: dict) -> StopConfig:
+    """Read the stop config from attributes in one pass (stored None counts as missing)."""
+    return StopConfig._make(d if attrs.get(k) is None else attrs[k] for k, d in STOP_CONFIG_DEFAULTS)
+
+
 def save_persistent_attributes(handler_input: HandlerInput, attrs: dict):
     """Save user preferences."""
-    try:
-        handler_input.attributes_manager.persistent_attributes = attrs
-        handler_input.attributes_manager.save_persistent_attributes()
-    except Exception:
-        handler_input.attributes_manager.session_attributes = attrs
+    am = handler_input.attributes_manager
+    user_id = _user_id(handler_input) if _HAS_PERSISTENCE else None
+    if _HAS_PERSISTENCE and get_dynamodb_adapter() is not None:
+        try:
+            am.persistent_attributes = attrs
+            am.save_persistent_attributes()
+            if user_id:
+                _attr_cache_put(user_id, attrs)
+            return
+        except (PersistenceException, AttributesManagerException) as e:
+            logger.warning(f"Could not save persistent attributes: {e}")
+
+    # Replace the contents of the session dict in place: handlers holding a reference
+    # to it (and setting it back afterwards) then keep the saved values
+    if user_id:
+        _attr_cache_drop(user_id)
+    session_attrs = am.session_attributes
+    if session_attrs is None:
+        am.session_attributes = dict(attrs)
+    else:
+        session_attrs.clear()
+        session_attrs.update(attrs)
 
 
 def get_session_attributes(handler_input: HandlerInput) -> dict:
@@ -120,25 +475,43 @@ def set_session_attributes(handler_input: HandlerInput, attrs: dict):
     handler_input.attributes_manager.session_attributes = attrs
 
 
-class LaunchRequestHandler(AbstractRequestHandler):
-    """Handler for Skill Launch."""
+def _route(handler_input: HandlerInput) -> Optional[AbstractRequestHandler]:
+    """Handler of a request, looked up in _REQUEST_DISPATCH / _INTENT_DISPATCH."""
+    request = handler_input.request_envelope.request
+    if request.object_type == "IntentRequest":
+        return _INTENT_DISPATCH.get(request.intent.name)
+    return _REQUEST_DISPATCH.get(request.object_type)
+
+
+class RoutedRequestHandler(AbstractRequestHandler):
+    """Request handler registered in the dispatch tables, which also decide its can_handle."""
 
     def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("LaunchRequest")(handler_input)
+        return _route(handler_input) is self
+
+
+class LaunchRequestHandler(RoutedRequestHandler):
+    """Handler for Skill Launch."""
 
     def handle(self, handler_input: HandlerInput) -> Response:
-        attrs = get_config_or_default(handler_input)
-        
-        stop_name = attrs.get("stop_name", "Quarante Journaux")
-        line_name = attrs.get("line_name", "Tram C")
-        is_default = attrs.get("is_default", False)
+        cfg = unpack_config(get_persistent_attributes(handler_input))
+
+        # The welcome only needs names: speak the default from DEFAULT_CONFIG, its stop refs
+        # are resolved by the intent that needs them (get_config_or_default)
+        if cfg.stop_point_ref:
+            stop_name = cfg.stop_name or DEFAULT_CONFIG["stop_name"]
+            line_name = cfg.line_name or DEFAULT_CONFIG["line_name"]
+            is_default = cfg.is_default
+        else:
+            default = _DEFAULT_CACHED or DEFAULT_CONFIG
+            stop_name = default["stop_name"]
+            line_name = default["line_name"]
+            is_default = True
         
         if is_default:
-            speech = f"Bienvenue. Arrêt par défaut : {stop_name}, {line_name}. "
-            speech += "Dites 'prochain passage' ou 'changer d'arrêt'."
+            speech = WELCOME_DEFAULT_SPEECH.format(stop=stop_name, line=line_name)
         else:
-            speech = f"Bienvenue. Votre arrêt : {stop_name}, {line_name}. "
-            speech += "Dites 'prochain passage' ou 'changer d'arrêt'."
+            speech = WELCOME_SAVED_SPEECH.format(stop=stop_name, line=line_name)
 
         return (
             handler_input.response_builder
@@ -148,99 +521,100 @@ class LaunchRequestHandler(AbstractRequestHandler):
         )
 
 
-class GetNextDeparturesIntentHandler(AbstractRequestHandler):
+class GetNextDeparturesIntentHandler(RoutedRequestHandler):
     """Handler for getting next departures."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("GetNextDeparturesIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        attrs = get_config_or_default(handler_input)
+        rb = handler_input.response_builder
+        cfg = unpack_config(get_config_or_default(handler_input))
         slot_line = get_slot_value(handler_input, "lineName")
-        
-        stop_point_ref = attrs.get("stop_point_ref")
-        line_ref = attrs.get("line_ref")
-        direction_ref = attrs.get("direction_ref", -1)
-        stop_name = attrs.get("stop_name")
-        line_name = attrs.get("line_name")
-        dest_name = attrs.get("dest_name")
+        line_ref, line_name = cfg.line_ref, cfg.line_name
 
-        # If user specified a line, update it
+        # If user specified a line, update it. Meanwhile, fetch the saved line's departures:
+        # they are the answer when the spoken line is not found or is the saved one.
+        speculative = None
         if slot_line:
-            line_info = tbm_client.find_line_by_query(slot_line)
+            if cfg.stop_point_ref:
+                speculative = _EXECUTOR.submit(
+                    get_tbm_client().get_departures,
+                    stop_point_ref=cfg.stop_point_ref,
+                    line_ref=line_ref,
+                    direction_ref=cfg.direction_ref,
+                )
+            line_info = find_line_cached(normalize_slot(slot_line))
             if line_info:
                 line_ref = line_info.get("line_ref")
                 line_name = line_info.get("line_name")
 
-        if not stop_point_ref:
+        if not cfg.stop_point_ref:
             # This shouldn't happen with default config, but just in case
-            speech = "Erreur de configuration. Dites 'enregistre l'arrêt' pour configurer."
+            speech = CONFIG_ERROR_SPEECH
             return (
-                handler_input.response_builder
-                .speak(speech)
+                rb.speak(speech)
                 .ask("Quel arrêt ?")
                 .response
             )
 
+        # The saved direction and destination belong to the saved line: any direction for another one
+        same_line = line_ref == cfg.line_ref
+        direction_ref = cfg.direction_ref if same_line else -1
+        dest_name = cfg.dest_name if same_line else None
+
         # Fetch departures from API
         try:
-            departures = tbm_client.get_departures(
-                stop_point_ref=stop_point_ref,
-                line_ref=line_ref,
-                direction_ref=direction_ref
-            )
+            if speculative and same_line:
+                departures = speculative.result()
+            else:
+                if speculative:
+                    speculative.cancel()
+                departures = get_tbm_client().get_departures(
+                    stop_point_ref=cfg.stop_point_ref,
+                    line_ref=line_ref,
+                    direction_ref=direction_ref
+                )
         except Exception as e:
             logger.error(f"API error: {e}")
-            speech = "Désolé, je n'ai pas pu récupérer les horaires. Réessayez dans quelques instants."
-            return handler_input.response_builder.speak(speech).response
+            speech = API_ERROR_SPEECH
+            return rb.speak(speech).response
 
-        if not departures:
-            speech = f"Pas de passage prévu pour {line_name or 'cette ligne'} à {stop_name}."
-            return handler_input.response_builder.speak(speech).response
+        # Minutes to the next departures (same "now" for each), skipping unreadable times
+        now_ts = time.time()
+        mins_list = [
+            m for m in (_mins_to(dep.get("expected") or dep.get("aimed"), now_ts) for dep in departures[:3])
+            if m is not None
+        ]
+
+        if not mins_list:
+            speech = NO_DEPARTURE_SPEECH.format(line=line_name or "cette ligne", stop=cfg.stop_name)
+            return rb.speak(speech).response
 
         # Build response
         line_label = line_name or "Le prochain"
-        dest_label = f" direction {dest_name}" if dest_name else ""
+        dest_label = DIRECTION_SPEECH.format(dest=dest_name) if dest_name else ""
         
-        if len(departures) == 1:
-            mins = _mins_to(departures[0].get("expected") or departures[0].get("aimed"))
-            if mins == 0:
-                speech = f"{line_label}{dest_label} arrive maintenant."
-            elif mins == 1:
-                speech = f"{line_label}{dest_label} dans 1 minute."
-            else:
-                speech = f"{line_label}{dest_label} dans {mins} minutes."
+        if len(mins_list) == 1:
+            mins = mins_list[0]
+            when = "arrive maintenant" if mins == 0 else f"dans {_format_mins(mins)}"
+            speech = NEXT_DEPARTURE_SPEECH.format(line=line_label, dest=dest_label, when=when)
         else:
-            times = []
-            for dep in departures[:3]:
-                mins = _mins_to(dep.get("expected") or dep.get("aimed"))
-                if mins == 0:
-                    times.append("maintenant")
-                elif mins == 1:
-                    times.append("1 minute")
-                else:
-                    times.append(f"{mins} minutes")
-            
-            times_str = ", ".join(times[:-1]) + f" et {times[-1]}" if len(times) > 1 else times[0]
-            speech = f"{line_label}{dest_label} : dans {times_str}."
+            times = [_format_mins(m) for m in mins_list]
+            times_str = ", ".join(times[:-1]) + " et " + times[-1]
+            speech = NEXT_DEPARTURES_SPEECH.format(line=line_label, dest=dest_label, times=times_str)
 
-        return handler_input.response_builder.speak(speech).response
+        return rb.speak(speech).response
 
 
-class SetFavoriteStopIntentHandler(AbstractRequestHandler):
+class SetFavoriteStopIntentHandler(RoutedRequestHandler):
     """Handler for setting favorite stop - Step 1: Get stop name."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("SetFavoriteStopIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
+        rb = handler_input.response_builder
         slot_stop = get_slot_value(handler_input, "stopName")
 
         if not slot_stop:
-            speech = "Je n'ai pas compris le nom de l'arrêt. Pouvez-vous répéter ?"
+            speech = STOP_NOT_UNDERSTOOD_SPEECH
             return (
-                handler_input.response_builder
-                .speak(speech)
+                rb.speak(speech)
                 .ask("Quel est le nom de l'arrêt ?")
                 .response
             )
@@ -250,30 +624,26 @@ class SetFavoriteStopIntentHandler(AbstractRequestHandler):
         session["pending_stop_name"] = slot_stop
         set_session_attributes(handler_input, session)
 
-        speech = f"D'accord, l'arrêt {slot_stop}. Quelle ligne ? Par exemple 'tram C' ou 'liane 1'."
+        speech = SET_STOP_SPEECH.format(stop=slot_stop)
         return (
-            handler_input.response_builder
-            .speak(speech)
+            rb.speak(speech)
             .ask("Quelle ligne ?")
             .response
         )
 
 
-class SetFavoriteLineIntentHandler(AbstractRequestHandler):
+class SetFavoriteLineIntentHandler(RoutedRequestHandler):
     """Handler for setting favorite line - Step 2: Get line."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("SetFavoriteLineIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
+        rb = handler_input.response_builder
         slot_line = get_slot_value(handler_input, "lineName")
         session = get_session_attributes(handler_input)
 
         if not slot_line:
-            speech = "Je n'ai pas compris la ligne. Dites par exemple 'tram C' ou 'liane 1'."
+            speech = LINE_NOT_UNDERSTOOD_SPEECH
             return (
-                handler_input.response_builder
-                .speak(speech)
+                rb.speak(speech)
                 .ask("Quelle ligne ?")
                 .response
             )
@@ -282,30 +652,28 @@ class SetFavoriteLineIntentHandler(AbstractRequestHandler):
         session["pending_line_name"] = slot_line
         set_session_attributes(handler_input, session)
 
-        # Get line info to show available directions
-        line_info = tbm_client.find_line_by_query(slot_line)
+        # Example direction for the prompt, only when it needs no API call (lines not loaded yet
+        # on a cold start); SetFavoriteDirectionIntent resolves the line anyway
+        line_info = find_line_cached(normalize_slot(slot_line)) if get_tbm_client().lines_loaded else None
         
         if line_info:
             dest = line_info.get("dest_name", "")
-            speech = f"Ligne {slot_line}. Quelle direction ? Par exemple 'direction {dest}' ou dites 'n'importe'."
+            speech = SET_LINE_EXAMPLE_SPEECH.format(line=slot_line, dest=dest)
         else:
-            speech = f"Ligne {slot_line}. Quelle direction ?"
+            speech = SET_LINE_SPEECH.format(line=slot_line)
 
         return (
-            handler_input.response_builder
-            .speak(speech)
+            rb.speak(speech)
             .ask("Quelle direction ?")
             .response
         )
 
 
-class SetFavoriteDirectionIntentHandler(AbstractRequestHandler):
+class SetFavoriteDirectionIntentHandler(RoutedRequestHandler):
     """Handler for setting favorite direction - Step 3: Complete setup."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("SetFavoriteDirectionIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
+        rb = handler_input.response_builder
         slot_dest = get_slot_value(handler_input, "destinationName")
         session = get_session_attributes(handler_input)
         
@@ -313,26 +681,24 @@ class SetFavoriteDirectionIntentHandler(AbstractRequestHandler):
         pending_line = session.get("pending_line_name")
 
         if not pending_stop or not pending_line:
-            speech = "Je n'ai pas toutes les informations. Recommencez en disant 'enregistre l'arrêt' suivi du nom."
+            speech = MISSING_INFO_SPEECH
             return (
-                handler_input.response_builder
-                .speak(speech)
+                rb.speak(speech)
                 .ask("Quel arrêt souhaitez-vous enregistrer ?")
                 .response
             )
 
         # Search for the complete combination
-        search_results = tbm_client.search_stop(
-            stop_query=pending_stop,
-            line_query=pending_line,
-            dest_query=slot_dest
+        search_results = search_stop_cached(
+            normalize_slot(pending_stop),
+            normalize_slot(pending_line),
+            normalize_slot(slot_dest),
         )
 
         if not search_results:
-            speech = f"Je n'ai pas trouvé l'arrêt {pending_stop} pour la ligne {pending_line}. Essayez avec un autre nom."
+            speech = STOP_NOT_FOUND_SPEECH.format(stop=pending_stop, line=pending_line)
             return (
-                handler_input.response_builder
-                .speak(speech)
+                rb.speak(speech)
                 .ask("Quel arrêt cherchez-vous ?")
                 .response
             )
@@ -360,131 +726,107 @@ class SetFavoriteDirectionIntentHandler(AbstractRequestHandler):
         line_name = attrs.get("line_name")
         dest_name = attrs.get("dest_name")
 
-        speech = f"Parfait ! Arrêt {stop_name}, ligne {line_name}"
+        parts = [SAVED_STOP_SPEECH.format(stop=stop_name, line=line_name)]
         if dest_name:
-            speech += f" direction {dest_name}"
-        speech += ". Dites 'prochain passage' pour les horaires."
+            parts.append(DIRECTION_SPEECH.format(dest=dest_name))
+        parts.append(SAVED_STOP_SUFFIX)
+        speech = "".join(parts)
 
         return (
-            handler_input.response_builder
-            .speak(speech)
+            rb.speak(speech)
             .ask("Voulez-vous les prochains passages ?")
             .response
         )
 
 
-class GetFavoriteIntentHandler(AbstractRequestHandler):
+class GetFavoriteIntentHandler(RoutedRequestHandler):
     """Handler for getting current favorite stop."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("GetFavoriteIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        attrs = get_config_or_default(handler_input)
-        
-        stop_name = attrs.get("stop_name", "Quarante Journaux")
-        line_name = attrs.get("line_name", "Tram C")
-        dest_name = attrs.get("dest_name", "Les Pyrénées")
-        is_default = attrs.get("is_default", False)
+        cfg = unpack_config(get_config_or_default(handler_input))
+
+        if cfg.stop_point_ref:
+            stop_name = cfg.stop_name or DEFAULT_CONFIG["stop_name"]
+            line_name = cfg.line_name or DEFAULT_CONFIG["line_name"]
+            dest_name = cfg.dest_name
+            is_default = cfg.is_default
+        else:
+            stop_name, line_name, dest_name = (
+                DEFAULT_CONFIG["stop_name"], DEFAULT_CONFIG["line_name"], DEFAULT_CONFIG["dest_name"]
+            )
+            is_default = True
 
         if is_default:
-            speech = f"Arrêt par défaut : {stop_name}, {line_name}"
+            parts = [DEFAULT_STOP_SPEECH.format(stop=stop_name, line=line_name)]
         else:
-            speech = f"Votre arrêt : {stop_name}, {line_name}"
+            parts = [YOUR_STOP_SPEECH.format(stop=stop_name, line=line_name)]
         
         if dest_name:
-            speech += f" direction {dest_name}"
-        speech += ". Dites 'changer d'arrêt' pour modifier."
+            parts.append(DIRECTION_SPEECH.format(dest=dest_name))
+        parts.append(GET_FAVORITE_SUFFIX)
+        speech = "".join(parts)
 
         return handler_input.response_builder.speak(speech).response
 
 
-class ClearFavoriteIntentHandler(AbstractRequestHandler):
+class ClearFavoriteIntentHandler(RoutedRequestHandler):
     """Handler for clearing favorite stop."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("ClearFavoriteIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
         save_persistent_attributes(handler_input, {})
-        speech = "J'ai supprimé votre arrêt. Dites 'enregistre l'arrêt' pour en configurer un nouveau."
-        return handler_input.response_builder.speak(speech).ask("Quel arrêt ?").response
+        return handler_input.response_builder.speak(CLEAR_SPEECH).ask("Quel arrêt ?").response
 
 
-class ChangeStopIntentHandler(AbstractRequestHandler):
+class ChangeStopIntentHandler(RoutedRequestHandler):
     """Handler for changing stop - prompts user to enter new stop."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("ChangeStopIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        speech = "D'accord. Quel arrêt ? Dites 'enregistre l'arrêt' suivi du nom."
-        return handler_input.response_builder.speak(speech).ask("Quel arrêt ?").response
+        return handler_input.response_builder.speak(CHANGE_STOP_SPEECH).ask("Quel arrêt ?").response
 
 
-class ListLinesIntentHandler(AbstractRequestHandler):
+class ListLinesIntentHandler(RoutedRequestHandler):
     """Handler for listing available lines."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("ListLinesIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        speech = (
-            "Les lignes TBM : trams A, B, C, D. "
-            "Bus Lianes 1 à 16. Et le Batcub. "
-            "Pour configurer, dites 'enregistre l'arrêt' suivi du nom."
-        )
-        return handler_input.response_builder.speak(speech).ask("Quelle ligne ?").response
+        return handler_input.response_builder.speak(LIST_LINES_SPEECH).ask("Quelle ligne ?").response
 
 
-class HelpIntentHandler(AbstractRequestHandler):
+class HelpIntentHandler(RoutedRequestHandler):
     """Handler for Help Intent."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.HelpIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        speech = (
-            "Je donne les horaires TBM en temps réel. "
-            "Dites 'enregistre l'arrêt' suivi du nom pour configurer. "
-            "Puis 'prochain passage' pour les horaires."
-        )
-        return handler_input.response_builder.speak(speech).ask("Que faire ?").response
+        return handler_input.response_builder.speak(HELP_SPEECH).ask("Que faire ?").response
 
 
-class CancelOrStopIntentHandler(AbstractRequestHandler):
+class CancelOrStopIntentHandler(RoutedRequestHandler):
     """Handler for Cancel and Stop Intents."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return (
-            is_intent_name("AMAZON.CancelIntent")(handler_input)
-            or is_intent_name("AMAZON.StopIntent")(handler_input)
-        )
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        speech = "À bientôt !"
-        return handler_input.response_builder.speak(speech).response
+        return _CANCEL_RESPONSE
 
 
-class FallbackIntentHandler(AbstractRequestHandler):
+class FallbackIntentHandler(RoutedRequestHandler):
     """Handler for Fallback Intent."""
 
-    def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_intent_name("AMAZON.FallbackIntent")(handler_input)
-
     def handle(self, handler_input: HandlerInput) -> Response:
-        speech = "Je n'ai pas compris. Dites 'prochain passage' ou 'aide'."
-        return handler_input.response_builder.speak(speech).ask("Que faire ?").response
+        return handler_input.response_builder.speak(FALLBACK_SPEECH).ask("Que faire ?").response
 
 
-class SessionEndedRequestHandler(AbstractRequestHandler):
+class SessionEndedRequestHandler(RoutedRequestHandler):
     """Handler for Session End."""
 
+    def handle(self, handler_input: HandlerInput) -> Response:
+        return _EMPTY_RESPONSE
+
+
+class DispatchHandler(AbstractRequestHandler):
+    """Routes requests to handlers by request type / intent name with a dict lookup."""
+
     def can_handle(self, handler_input: HandlerInput) -> bool:
-        return is_request_type("SessionEndedRequest")(handler_input)
+        return _route(handler_input) is not None
 
     def handle(self, handler_input: HandlerInput) -> Response:
-        return handler_input.response_builder.response
+        return _route(handler_input).handle(handler_input)
 
 
 class CatchAllExceptionHandler(AbstractExceptionHandler):
@@ -495,27 +837,74 @@ class CatchAllExceptionHandler(AbstractExceptionHandler):
 
     def handle(self, handler_input: HandlerInput, exception: Exception) -> Response:
         logger.error(f"Exception: {exception}", exc_info=True)
-        speech = "Désolé, une erreur s'est produite. Réessayez."
+        speech = ERROR_SPEECH
         return handler_input.response_builder.speak(speech).ask("Que faire ?").response
 
 
-# Skill Builder
-sb = CustomSkillBuilder(persistence_adapter=dynamodb_adapter) if dynamodb_adapter else CustomSkillBuilder()
+# Handlers by request type and by intent name: the only place naming them (see _route)
+_cancel_or_stop_handler = CancelOrStopIntentHandler()
+
+_REQUEST_DISPATCH = {
+    "LaunchRequest": LaunchRequestHandler(),
+    "SessionEndedRequest": SessionEndedRequestHandler(),
+}
+
+_INTENT_DISPATCH = {
+    "GetNextDeparturesIntent": GetNextDeparturesIntentHandler(),
+    "SetFavoriteStopIntent": SetFavoriteStopIntentHandler(),
+    "SetFavoriteLineIntent": SetFavoriteLineIntentHandler(),
+    "SetFavoriteDirectionIntent": SetFavoriteDirectionIntentHandler(),
+    "GetFavoriteIntent": GetFavoriteIntentHandler(),
+    "ClearFavoriteIntent": ClearFavoriteIntentHandler(),
+    "ChangeStopIntent": ChangeStopIntentHandler(),
+    "ListLinesIntent": ListLinesIntentHandler(),
+    "AMAZON.HelpIntent": HelpIntentHandler(),
+    "AMAZON.CancelIntent": _cancel_or_stop_handler,
+    "AMAZON.StopIntent": _cancel_or_stop_handler,
+    "AMAZON.FallbackIntent": FallbackIntentHandler(),
+}
+
+
+def build_skill() -> CustomSkillBuilder:
+    """Register handlers (API client and DynamoDB are only set up when a handler needs them)."""
+    sb = CustomSkillBuilder(persistence_adapter=LazyPersistenceAdapter())
+
+    # One dispatching handler instead of probing each handler's can_handle in turn
+    sb.add_request_handler(DispatchHandler())
+
+    sb.add_exception_handler(CatchAllExceptionHandler())
+    return sb
+
+
+# CustomSkillBuilder.lambda_handler() rebuilds the skill configuration (handler chains,
+# mappers, adapters) on every invocation; the handler set is fixed, so build it once
+_SKILL = build_skill().create()
+
+
+_initialized = False
+
+
+def _ensure_initialized():
+    """Warm the DynamoDB and TBM connections and resolve the default stop in the background (once)."""
+    global _initialized
+    if not _initialized:
+        _initialized = True
+        _WARMUP_EXECUTOR.submit(prime_dynamodb)
+        _WARMUP_EXECUTOR.submit(lambda: get_tbm_client().warmup())
+        prefetch_default_config()
+
 
-sb.add_request_handler(LaunchRequestHandler())
-sb.add_request_handler(GetNextDeparturesIntentHandler())
-sb.add_request_handler(SetFavoriteStopIntentHandler())
-sb.add_request_handler(SetFavoriteLineIntentHandler())
-sb.add_request_handler(SetFavoriteDirectionIntentHandler())
-sb.add_request_handler(GetFavoriteIntentHandler())
-sb.add_request_handler(ClearFavoriteIntentHandler())
-sb.add_request_handler(ChangeStopIntentHandler())
-sb.add_request_handler(ListLinesIntentHandler())
-sb.add_request_handler(HelpIntentHandler())
-sb.add_request_handler(CancelOrStopIntentHandler())
-sb.add_request_handler(FallbackIntentHandler())
-sb.add_request_handler(SessionEndedRequestHandler())
+def lambda_handler(event, context):
+    _ensure_initialized()
+    request_envelope = _SKILL.serializer.deserialize(
+        payload=json.dumps(event), obj_type=RequestEnvelope)
+    response_envelope = _SKILL.invoke(request_envelope=request_envelope, context=context)
+    return _SKILL.serializer.serialize(response_envelope)
 
-sb.add_exception_handler(CatchAllExceptionHandler())
 
-lambda_handler = sb.lambda_handler()
+# Warm up during a Lambda cold start (not when imported elsewhere, e.g. by tests), except
+# under SnapStart: the init phase is snapshotted and open sockets do not survive a restore,
+# so the first invocation warms up instead
+if (os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+        and os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") != "snap-start"):
+    _ensure_initialized()
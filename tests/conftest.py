@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Test setup: the Lambda sources are imported as top-level modules (as in the Lambda runtime)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda"))
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the TBM API client (SIRI-Lite responses are faked, no network)
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import api
+
+
+def _lines_response(lines):
+    return {"Siri": {"LinesDelivery": {"AnnotatedLineRef": [
+        {
+            "LineRef": [{"value": line_ref}],
+            "LineName": [{"value": name}],
+            "LineCode": [{"value": code}],
+            "Destinations": [
+                {"DirectionRef": [{"value": str(direction)}], "PlaceName": [{"value": place}]}
+                for direction, place in destinations
+            ],
+        }
+        for line_ref, name, code, destinations in lines
+    ]}}}
+
+
+def _stop_points_response(stops):
+    return {"Siri": {"StopPointsDelivery": {"AnnotatedStopPointRef": [
+        {
+            "StopName": [{"value": name}],
+            "StopPointRef": [{"value": ref}],
+            "Lines": [{"value": line_ref} for line_ref in line_refs],
+        }
+        for ref, name, line_refs in stops
+    ]}}}
+
+
+def _departures_response(count):
+    visit = {"MonitoredVehicleJourney": {
+        "LineRef": [{"value": "L:C"}],
+        "DirectionRef": [{"value": "0"}],
+        "DestinationName": [{"value": "Les Pyrénées"}],
+        "MonitoredCall": {"AimedDepartureTime": "2026-10-14T10:00:00Z"},
+    }}
+    return {"Siri": {"ServiceDelivery": {"StopMonitoringDelivery": [
+        {"MonitoredStopVisit": [visit] * count}
+    ]}}}
+
+
+LINES = [
+    ("L:C", "Tram C", "C", [(0, "Les Pyrénées"), (1, "Parc des Expositions")]),
+    ("L:A", "Tram A", "A", [(0, "Mérignac")]),
+]
+
+STOPS = [
+    ("SP:1", "Quarante Journaux", ["L:C"]),
+    ("SP:2", "Quarante Journaux", ["L:C"]),
+    ("SP:3", "Gambetta", ["L:A"]),
+]
+
+# Stops with departures, per (stop_point_ref, direction_ref); -1 is any direction
+SERVED = {("SP:1", 0), ("SP:1", -1), ("SP:2", 1), ("SP:2", -1), ("SP:3", 0), ("SP:3", -1)}
+
+
+class FakeTBMClient(api.TBMClient):
+    """TBMClient answering from fixed SIRI data and recording the endpoints called."""
+
+    def __init__(self, lines=LINES, stops=STOPS, served=SERVED, cache_file=None):
+        self.lines = lines
+        self.stops = stops
+        self.served = served
+        self.calls = []
+        super().__init__(cache_file=cache_file)
+
+    def _get(self, endpoint, params, timeout=None):
+        self.calls.append(endpoint)
+        if endpoint == "lines-discovery.json":
+            return _lines_response(self.lines)
+        if endpoint == "stoppoints-discovery.json":
+            return _stop_points_response(self.stops)
+        key = (params["MonitoringRef"], params.get("DirectionRef", -1))
+        return _departures_response(1 if key in self.served else 0)
+
+
+def test_search_stop_filters_by_direction():
+    client = FakeTBMClient()
+
+    to_pyrenees = client.search_stop("40 journaux", "tram c", "pyrenees")
+    to_expositions = client.search_stop("quarante journaux", "tram c", "expositions")
+
+    assert [r["stop_point_ref"] for r in to_pyrenees] == ["SP:1"]
+    assert to_pyrenees[0]["direction_ref"] == 0
+    assert to_pyrenees[0]["dest_name"] == "Les Pyrénées"
+    assert [r["stop_point_ref"] for r in to_expositions] == ["SP:2"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Quarante Journaux", "40 journaux"),
+    ("dix-sept", "17"),
+    ("Dix Huit", "10 8"),
+    ("Dixième", "dixieme"),
+    ("tram un", "tram 1"),
+])
+def test_normalize_text_number_words(text, expected):
+    assert api.normalize_text(text) == expected
+
+
+def test_normalize_text_is_memoized():
+    api.normalize_text.cache_clear()
+
+    api.normalize_text("Gare Saint-Jean")
+    api.normalize_text("Gare Saint-Jean")
+
+    info = api.normalize_text.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_fuzzy_match_tolerates_typos():
+    api.fuzzy_match.cache_clear()
+
+    assert api.words_match("pyrennees", "pyrenees")
+    assert not api.words_match("gambetta", "galin")
+    assert api.fuzzy_match("gare gambeta", "gambetta gare") == pytest.approx(0.7)
+
+
+def test_fuzzy_match_without_rapidfuzz(monkeypatch):
+    monkeypatch.setattr(api, "fuzz", None)
+    api.fuzzy_match.cache_clear()
+
+    assert not api.words_match("pyrennees", "pyrenees")
+    assert api.fuzzy_match("gare gambeta", "gambetta gare") == pytest.approx(0.35)
+    api.fuzzy_match.cache_clear()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Les Pyrénées", "les pyrenees"),
+    ("Œuvre Cœur", "oeuvre coeur"),
+    ("L’Église", "l'eglise"),
+    ("  Mérignac Centre ", "merignac centre"),
+    ("", ""),
+])
+def test_normalize_text_folds_accents(text, expected):
+    assert api.normalize_text(text) == expected
+
+
+def test_only_departures_use_the_short_timeout():
+    client = api.TBMClient(cache_file=None)
+    sent = {}
+
+    def fake_get(url, params, timeout):
+        sent[url.rsplit("/", 1)[1]] = timeout
+        raise api.requests.ConnectionError("offline")
+
+    client._session.get = fake_get
+    for call in (client.get_lines, client._get_stop_points, lambda: client.get_departures("SP:1")):
+        with pytest.raises(api.requests.ConnectionError):
+            call()
+
+    assert sent == {
+        "lines-discovery.json": api.DISCOVERY_TIMEOUT,
+        "stoppoints-discovery.json": api.DISCOVERY_TIMEOUT,
+        "stop-monitoring.json": api.MONITORING_TIMEOUT,
+    }
+
+
+class _NoThreads:
+    def submit(self, *args, **kwargs):
+        raise AssertionError("no direction check should go to the worker threads")
+
+
+def test_served_stops_only_fans_out_unknown_stops(monkeypatch):
+    stops = [(f"SP:{i}", f"Victoire {i}", ["L:C"]) for i in range(4)]
+    client = FakeTBMClient(stops=stops, served={(f"SP:{i}", 0) for i in range(4)})
+    assert len(client.search_stop("victoire", "tram c", "pyrenees")) == 4
+    checks = client.calls.count("stop-monitoring.json")
+
+    monkeypatch.setattr(api, "_DIRECTION_EXECUTOR", _NoThreads())
+    assert len(client.search_stop("victoire", "tram c", "pyrenees")) == 4
+    assert client.calls.count("stop-monitoring.json") == checks
+
+
+def test_stop_list_is_downloaded_once_for_all_lines():
+    client = FakeTBMClient()
+
+    # "tram c" matches both directions of line C
+    client.search_stop("quarante journaux", "tram c")
+    client.search_stop("gambetta", "tram a")
+
+    assert client.calls.count("stoppoints-discovery.json") == 1
+    assert client.calls.count("lines-discovery.json") == 1
+
+
+def test_stops_for_line_in_another_area():
+    client = FakeTBMClient()
+    client.get_stops_for_line("L:C", 0)
+
+    stops = client.get_stops_for_line("L:C", 0, bbox=(-0.6, 44.9, -0.5, 44.8))
+    client.get_stops_for_line("L:C", 0, bbox=(-0.6, 44.9, -0.5, 44.8))
+
+    assert [s["stop_point_ref"] for s in stops] == ["SP:1", "SP:2"]
+    assert client.calls.count("stoppoints-discovery.json") == 3
+
+
+def test_direction_checks_stop_after_ten_served_stops():
+    stops = [(f"SP:{i}", f"Victoire {i}", ["L:C"]) for i in range(25)]
+    served = {(f"SP:{i}", 0) for i in range(25)}
+    client = FakeTBMClient(stops=stops, served=served)
+
+    results = client.search_stop("victoire", "tram c", "pyrenees")
+
+    assert len(results) == 10
+    assert client.calls.count("stop-monitoring.json") == 10
+
+
+def test_any_direction_drops_stops_without_departures():
+    client = FakeTBMClient(served={("SP:1", -1)})
+
+    assert client.serves_direction("SP:1", "L:C", -1)
+    assert not client.serves_direction("SP:2", "L:C", -1)
+
+
+def test_direction_miss_is_checked_again_after_ttl(monkeypatch):
+    client = FakeTBMClient(served=set())
+
+    assert not client.serves_direction("SP:1", "L:C", 0)
+    assert not client.serves_direction("SP:1", "L:C", 0)
+    assert client.calls.count("stop-monitoring.json") == 1
+
+    monkeypatch.setattr(api, "DIRECTION_MISS_TTL", 0)
+    client.served = {("SP:1", 0)}
+    assert client.serves_direction("SP:1", "L:C", 0)
+    assert client.calls.count("stop-monitoring.json") == 2
+
+    # A served stop is remembered
+    assert client.serves_direction("SP:1", "L:C", 0)
+    assert client.calls.count("stop-monitoring.json") == 2
+
+
+def _wait_for_snapshot():
+    api._SNAPSHOT_EXECUTOR.submit(lambda: None).result()
+
+
+def test_disk_cache_keeps_each_section_time(tmp_path):
+    cache_file = str(tmp_path / "cache.json")
+    stale = time.time() - api.CACHE_TTL - 60
+    fresh = time.time() - 60
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "lines": {"saved_at": stale, "data": {"L:X-0": {"line_ref": "L:X", "line_name": "Old"}}},
+            "stop_points": {
+                "saved_at": fresh,
+                "data": [{"stop_name": "Gambetta", "stop_point_ref": "SP:3", "lines": ["L:A"]}],
+            },
+        }, f)
+
+    client = FakeTBMClient(cache_file=cache_file)
+    assert not client.lines_loaded
+    assert [s["stop_point_ref"] for s in client.get_stops_for_line("L:A", 0)] == ["SP:3"]
+
+    client.get_lines()
+    assert client.calls == ["lines-discovery.json"]
+
+    _wait_for_snapshot()
+    with open(cache_file, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["stop_points"]["saved_at"] == pytest.approx(fresh)
+    assert snapshot["lines"]["saved_at"] > fresh
+    assert "L:C-0" in snapshot["lines"]["data"]
+
+
+def test_disk_cache_is_written_in_the_background(tmp_path):
+    cache_file = tmp_path / "cache.json"
+    client = FakeTBMClient(cache_file=str(cache_file))
+    release = threading.Event()
+    api._SNAPSHOT_EXECUTOR.submit(release.wait)
+
+    try:
+        client.get_lines()
+        assert not cache_file.exists()
+    finally:
+        release.set()
+    _wait_for_snapshot()
+    assert cache_file.exists()
+
+
+@pytest.mark.parametrize("field, expected", [
+    ([{"value": "Tram C"}], "Tram C"),
+    ([{"Value": "Tram C"}], "Tram C"),
+    (["Tram C"], "Tram C"),
+    ({"value": "Tram C"}, "Tram C"),
+    ("Tram C", "Tram C"),
+    ([], ""),
+    ([42], ""),
+    (None, ""),
+    (42, ""),
+])
+def test_get_value(field, expected):
+    assert api.get_value(field) == expected
+
+
+def test_extract_keywords_splits_on_punctuation():
+    assert api.extract_keywords("Les Quarante-Journaux, Gare_St.Jean") == ["40", "journaux", "gare", "st", "jean"]
+    assert api.extract_keywords("à la") == []
+    assert api.extract_keywords(None) == []
+
+
+def test_find_line_by_query():
+    client = FakeTBMClient()
+
+    assert client.find_line_by_query("c")["line_ref"] == "L:C"
+    assert client.find_line_by_query("tram a")["line_ref"] == "L:A"
+    assert client.find_line_by_query("bus 99") is None
+
+
+def test_dig():
+    data = {"Siri": {"LinesDelivery": {"AnnotatedLineRef": ["L:C"]}}}
+
+    assert api._dig(data, ("Siri", "LinesDelivery", "AnnotatedLineRef"), []) == ["L:C"]
+    assert api._dig(data, ("Siri", "StopPointsDelivery", "AnnotatedStopPointRef"), []) == []
+    assert api._dig({"Siri": None}, ("Siri", "LinesDelivery"), "missing") == "missing"
+    assert api._dig({}, (), "missing") == {}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (3, 3),
+    (" 12 ", 12),
+    ("0", 0),
+    (None, -1),
+    ("", -1),
+    ("abc", -1),
+    (2.0, -1),
+])
+def test_to_int(value, expected):
+    assert api.to_int(value) == expected
+
+
+def test_to_int_default():
+    assert api.to_int(None, default=0) == 0
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the skill helpers and handlers (no DynamoDB, TBM client faked)
+"""
+
+import calendar
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+from ask_sdk_core.response_helper import ResponseFactory
+from ask_sdk_model import Intent, IntentRequest, LaunchRequest, SessionEndedRequest
+
+import api
+import lambda_function as lf
+from test_api import FakeTBMClient
+
+TEN_UTC = calendar.timegm((2026, 10, 14, 10, 0, 0, 0, 0, 0))
+
+
+@pytest.fixture
+def attr_cache(monkeypatch):
+    cache = OrderedDict()
+    monkeypatch.setattr(lf, "_ATTR_CACHE", cache)
+    return cache
+
+
+class _AttributesManager:
+    def __init__(self, persistent_attributes):
+        self._persistent_attributes = persistent_attributes
+        self.session_attributes = {}
+        self.reads = 0
+
+    @property
+    def persistent_attributes(self):
+        self.reads += 1
+        return self._persistent_attributes
+
+
+def _user_input(user_id, attributes_manager):
+    return SimpleNamespace(
+        attributes_manager=attributes_manager,
+        request_envelope=SimpleNamespace(
+            context=SimpleNamespace(system=SimpleNamespace(user=SimpleNamespace(user_id=user_id)))
+        ),
+    )
+
+
+def test_persistent_attributes_are_read_once_per_user(monkeypatch, attr_cache):
+    monkeypatch.setattr(lf, "_HAS_PERSISTENCE", True)
+    monkeypatch.setattr(lf, "get_dynamodb_adapter", lambda: object())
+    am = _AttributesManager({"stop_point_ref": "SP:1"})
+
+    assert lf.get_persistent_attributes(_user_input("u1", am)) == {"stop_point_ref": "SP:1"}
+    assert lf.get_persistent_attributes(_user_input("u1", am)) == {"stop_point_ref": "SP:1"}
+    assert am.reads == 1
+
+    monkeypatch.setattr(lf, "ATTR_CACHE_TTL", 0)
+    lf.get_persistent_attributes(_user_input("u1", am))
+    assert am.reads == 2
+
+
+def test_attr_cache_keeps_the_newest_users(monkeypatch, attr_cache):
+    monkeypatch.setattr(lf, "ATTR_CACHE_MAXSIZE", 3)
+
+    for i in range(5):
+        lf._attr_cache_put(f"u{i}", {"i": i})
+    lf._attr_cache_put("u2", {"i": 2})
+
+    assert list(attr_cache) == ["u3", "u4", "u2"]
+    assert lf._attr_cache_get("u0") is None
+    assert lf._attr_cache_get("u4") == {"i": 4}
+
+
+def test_attr_cache_drops_expired_entries_on_write(monkeypatch, attr_cache):
+    now = 1000.0
+    monkeypatch.setattr(lf.time, "time", lambda: now)
+    lf._attr_cache_put("u1", {})
+    lf._attr_cache_put("u2", {})
+
+    now += lf.ATTR_CACHE_TTL
+    lf._attr_cache_put("u3", {})
+
+    assert list(attr_cache) == ["u3"]
+
+
+@pytest.mark.parametrize("iso_ts", [
+    "2026-10-14T10:00:00Z",
+    "2026-10-14T10:00:00.000Z",
+    "2026-10-14T12:00:00+02:00",
+    "2026-10-14T12:00:00.123+0200",
+    "2026-10-14T08:00:00-02:00",
+])
+def test_parse_epoch(iso_ts):
+    assert lf._parse_epoch(iso_ts) == TEN_UTC
+
+
+def test_unpack_config_defaults():
+    cfg = lf.unpack_config({})
+
+    assert cfg == lf.StopConfig()
+    assert cfg.direction_ref == -1
+    assert cfg.is_default is False
+
+
+def test_unpack_config_reads_every_field():
+    attrs = {
+        "stop_point_ref": "SP:1",
+        "line_ref": "L:C",
+        "direction_ref": 0,
+        "stop_name": "Quarante Journaux",
+        "line_name": "Tram C",
+        "dest_name": "Les Pyrénées",
+        "is_default": True,
+        "unrelated": "ignored",
+    }
+
+    assert lf.unpack_config(attrs) == lf.StopConfig(
+        "SP:1", "L:C", 0, "Quarante Journaux", "Tram C", "Les Pyrénées", True
+    )
+
+
+def test_terminal_handlers_return_prebuilt_responses():
+    ended = lf.SessionEndedRequestHandler().handle(None)
+    cancel = lf.CancelOrStopIntentHandler().handle(None)
+
+    assert ended is lf._EMPTY_RESPONSE
+    assert ended.output_speech is None
+    assert cancel is lf.CancelOrStopIntentHandler().handle(None)
+    assert lf.CANCEL_SPEECH in cancel.output_speech.ssml
+
+
+def _handler_input(session_attributes):
+    return SimpleNamespace(
+        attributes_manager=SimpleNamespace(session_attributes=session_attributes),
+        request_envelope=SimpleNamespace(),
+        response_builder=ResponseFactory(),
+    )
+
+
+class _FakeClient:
+    def __init__(self, departures):
+        self.departures = departures
+        self.calls = []
+        self.directions = []
+
+    def get_departures(self, **kwargs):
+        self.calls.append(kwargs["line_ref"])
+        self.directions.append(kwargs["direction_ref"])
+        return self.departures.get(kwargs["line_ref"], [])
+
+
+SAVED_CONFIG = {
+    "stop_point_ref": "SP:1",
+    "line_ref": "L:C",
+    "direction_ref": 0,
+    "stop_name": "Quarante Journaux",
+    "line_name": "Tram C",
+    "dest_name": "Les Pyrénées",
+}
+
+LINES_BY_QUERY = {
+    "tram c": {"line_ref": "L:C", "line_name": "Tram C"},
+    "tram a": {"line_ref": "L:A", "line_name": "Tram A"},
+}
+
+
+def _departures_speech(monkeypatch, departures, slot_line=None, client=None):
+    """Speech of GetNextDeparturesIntent for SAVED_CONFIG, departures given by line_ref."""
+    monkeypatch.setattr(lf, "get_config_or_default", lambda handler_input: SAVED_CONFIG)
+    monkeypatch.setattr(lf, "get_tbm_client", lambda: client or _FakeClient(departures))
+    monkeypatch.setattr(lf, "find_line_cached", LINES_BY_QUERY.get)
+    monkeypatch.setattr(lf, "get_slot_value", lambda handler_input, slot_name: slot_line)
+    monkeypatch.setattr(lf.time, "time", lambda: TEN_UTC)
+
+    response = lf.GetNextDeparturesIntentHandler().handle(_handler_input({}))
+    return response.output_speech.ssml
+
+
+DEPARTURES_BY_LINE = {
+    "L:C": [{"expected": "2026-10-14T10:03:00Z"}],
+    "L:A": [{"expected": "2026-10-14T10:07:00Z"}],
+}
+
+
+def test_saved_line_departures_are_prefetched_once(monkeypatch):
+    client = _FakeClient(DEPARTURES_BY_LINE)
+
+    speech = _departures_speech(monkeypatch, None, slot_line="Tram C", client=client)
+
+    assert "Tram C direction Les Pyrénées dans 3 minutes" in speech
+    assert client.calls == ["L:C"]
+
+
+def test_unknown_spoken_line_answers_with_the_saved_line(monkeypatch):
+    speech = _departures_speech(monkeypatch, DEPARTURES_BY_LINE, slot_line="bus 99")
+
+    assert "Tram C direction Les Pyrénées dans 3 minutes" in speech
+
+
+def test_other_spoken_line_is_fetched(monkeypatch):
+    client = _FakeClient(DEPARTURES_BY_LINE)
+
+    speech = _departures_speech(monkeypatch, None, slot_line="Tram A", client=client)
+
+    assert "Tram A dans 7 minutes" in speech
+    assert "Pyrénées" not in speech
+    assert client.calls[-1] == "L:A"
+    assert client.directions[-1] == -1
+
+
+def test_unpack_config_stored_none_counts_as_missing():
+    cfg = lf.unpack_config({"stop_point_ref": "SP:1", "direction_ref": None, "line_name": None})
+
+    assert cfg.stop_point_ref == "SP:1"
+    assert cfg.direction_ref == -1
+    assert cfg.line_name is None
+
+
+def test_unpack_config_keeps_direction_zero():
+    assert lf.unpack_config({"direction_ref": 0}).direction_ref == 0
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeTBMClient(served={("SP:2", 0)})
+    monkeypatch.setattr(lf, "get_tbm_client", lambda: client)
+    lf._rank_stops_memo.cache_clear()
+    yield client
+    lf._rank_stops_memo.cache_clear()
+
+
+def _refs(results):
+    return [r["stop_point_ref"] for r in results]
+
+
+def test_search_stop_cached_checks_misses_again_after_ttl(monkeypatch, fake_client):
+    assert _refs(lf.search_stop_cached("quarante journaux", "tram c", "pyrenees")) == ["SP:2"]
+
+    fake_client.served = {("SP:1", 0), ("SP:2", 0)}
+    assert _refs(lf.search_stop_cached("quarante journaux", "tram c", "pyrenees")) == ["SP:2"]
+
+    monkeypatch.setattr(api, "DIRECTION_MISS_TTL", 0)
+    assert _refs(lf.search_stop_cached("quarante journaux", "tram c", "pyrenees")) == ["SP:1", "SP:2"]
+    assert fake_client.calls.count("stoppoints-discovery.json") == 1
+
+
+def test_search_stop_cached_does_not_keep_empty_rankings(fake_client):
+    assert lf.search_stop_cached("nulle part", "tram c", None) == ()
+
+    fake_client.stops = fake_client.stops + [("SP:9", "Nulle Part", ["L:C"])]
+    fake_client._stop_points = None
+    fake_client._stops_cache.clear()
+    fake_client.served = {("SP:9", 0)}
+    assert _refs(lf.search_stop_cached("nulle part", "tram c", None)) == ["SP:9"]
+
+
+def test_format_mins():
+    assert lf._format_mins(0) == "maintenant"
+    assert lf._format_mins(1) == "1 minute"
+    assert lf._format_mins(7) == "7 minutes"
+
+
+def test_save_without_persistence_updates_session_in_place(monkeypatch):
+    monkeypatch.setattr(lf, "_HAS_PERSISTENCE", False)
+    session = {"stop_point_ref": "SP:1", "dest_name": "Les Pyrénées"}
+    handler_input = _handler_input(session)
+
+    lf.save_persistent_attributes(handler_input, {"stop_point_ref": "SP:2"})
+
+    assert handler_input.attributes_manager.session_attributes is session
+    assert session == {"stop_point_ref": "SP:2"}
+
+
+def test_save_without_persistence_creates_session(monkeypatch):
+    monkeypatch.setattr(lf, "_HAS_PERSISTENCE", False)
+    handler_input = _handler_input(None)
+    attrs = {"stop_point_ref": "SP:2"}
+
+    lf.save_persistent_attributes(handler_input, attrs)
+
+    assert handler_input.attributes_manager.session_attributes == attrs
+
+
+def test_lambda_handler_answers_with_the_prebuilt_skill(monkeypatch):
+    monkeypatch.setattr(lf, "_initialized", True)  # No warmup calls
+    event = {
+        "version": "1.0",
+        "session": {"new": False, "sessionId": "s", "application": {"applicationId": "a"}},
+        "context": {"System": {"application": {"applicationId": "a"}, "user": {"userId": "u"}}},
+        "request": {
+            "type": "IntentRequest",
+            "requestId": "r",
+            "timestamp": "2026-10-14T10:00:00Z",
+            "locale": "fr-FR",
+            "intent": {"name": "AMAZON.HelpIntent"},
+        },
+    }
+
+    response = lf.lambda_handler(event, None)
+
+    assert lf.HELP_SPEECH in response["response"]["outputSpeech"]["ssml"]
+
+
+def test_default_config_is_looked_up_again_after_ttl(monkeypatch, fake_client):
+    monkeypatch.setattr(lf, "_HAS_PERSISTENCE", False)
+    monkeypatch.setattr(lf, "_DEFAULT_CACHED", None)
+    monkeypatch.setattr(lf, "_DEFAULT_FUTURE", None)
+    handler_input = _handler_input({})
+
+    assert lf.get_config_or_default(handler_input)["stop_point_ref"] == "SP:2"
+
+    fake_client.served = {("SP:1", 0), ("SP:2", 0)}
+    assert lf.get_config_or_default(handler_input)["stop_point_ref"] == "SP:2"
+
+    monkeypatch.setattr(api, "DIRECTION_MISS_TTL", 0)
+    monkeypatch.setattr(lf, "DEFAULT_CONFIG_TTL", 0)
+    default = lf.get_config_or_default(handler_input)
+    assert default["stop_point_ref"] == "SP:1"
+    assert default["is_default"] is True
+
+
+def _request_input(request):
+    return SimpleNamespace(request_envelope=SimpleNamespace(request=request))
+
+
+@pytest.mark.parametrize("request_type, request_class", [
+    ("LaunchRequest", LaunchRequest),
+    ("SessionEndedRequest", SessionEndedRequest),
+])
+def test_request_dispatch_matches_can_handle(request_type, request_class):
+    handler_input = _request_input(request_class())
+
+    assert lf._REQUEST_DISPATCH[request_type].can_handle(handler_input)
+    assert lf.DispatchHandler().can_handle(handler_input)
+
+
+@pytest.mark.parametrize("intent_name", sorted(lf._INTENT_DISPATCH))
+def test_intent_dispatch_matches_can_handle(intent_name):
+    handler_input = _request_input(IntentRequest(intent=Intent(name=intent_name)))
+    handler = lf._INTENT_DISPATCH[intent_name]
+
+    assert handler.can_handle(handler_input)
+    assert not any(h.can_handle(handler_input) for h in set(lf._INTENT_DISPATCH.values()) - {handler})
+
+
+def test_unknown_intent_is_not_handled():
+    handler_input = _request_input(IntentRequest(intent=Intent(name="UnknownIntent")))
+
+    assert not lf.DispatchHandler().can_handle(handler_input)
+    assert not lf.HelpIntentHandler().can_handle(handler_input)
+
+
+def test_next_departures_speech(monkeypatch):
+    speech = _departures_speech(monkeypatch, {"L:C": [
+        {"expected": "2026-10-14T10:00:20Z"},
+        {"aimed": "2026-10-14T12:01:00+02:00"},
+        {"expected": "2026-10-14T10:09:00Z"},
+    ]})
+
+    assert "maintenant, 1 minute et 9 minutes" in speech
+
+
+def test_next_departures_skip_unreadable_times(monkeypatch):
+    speech = _departures_speech(monkeypatch, {"L:C": [
+        {"expected": "bad"},
+        {"expected": "2026-10-14T10:04:00Z"},
+    ]})
+
+    assert "None" not in speech
+    assert "dans 4 minutes" in speech
+
+
+def test_next_departures_all_unreadable(monkeypatch):
+    speech = _departures_speech(monkeypatch, {"L:C": [{"expected": "bad"}, {"aimed": None}]})
+
+    assert "None" not in speech
+    assert lf.NO_DEPARTURE_SPEECH.format(line="Tram C", stop="Quarante Journaux") in speech
+
+
+def test_get_favorite_without_stored_names(monkeypatch):
+    monkeypatch.setattr(lf, "get_config_or_default", lambda handler_input: {
+        "stop_point_ref": "SP:1", "stop_name": None, "line_name": None,
+    })
+
+    speech = lf.GetFavoriteIntentHandler().handle(_handler_input({})).output_speech.ssml
+
+    assert "None" not in speech
+    assert lf.YOUR_STOP_SPEECH.format(
+        stop=lf.DEFAULT_CONFIG["stop_name"], line=lf.DEFAULT_CONFIG["line_name"]
+    ) in speech
+
+
+@pytest.mark.parametrize("iso_ts", [
+    "2026-10-14T10:00:00",
+    "bad",
+    "2026-10-14",
+    "2026-1a-14T10:00:00Z",
+    "2026-10-14 10:00:00Z",
+    "2026-10-14T12:00:00+aa:00",
+    "2026-10-14T12:00:00+2",
+    "2026-13-14T10:00:00Z",
+    "2026-00-14T10:00:00Z",
+    "0000-10-14T10:00:00Z",
+    "2026-02-30T10:00:00Z",
+    "2026-10-14T24:00:00Z",
+    "2026-10-14T10:60:00Z",
+    "2026-10-14T12:00:00+02x00",
+    "2026-10-14T10:00:00.Z",
+    "2026-10-14T10:00:00123Z",
+])
+def test_parse_epoch_rejects_other_shapes(iso_ts):
+    assert lf._parse_epoch(iso_ts) is None
+
+
+def test_mins_to():
+    assert lf._mins_to("2026-10-14T10:05:30Z", TEN_UTC) == 5
+    assert lf._mins_to("2026-10-14T09:58:00Z", TEN_UTC) == 0
+    assert lf._mins_to(None, TEN_UTC) is None
+    assert lf._mins_to(1234, TEN_UTC) is None
+    assert lf._mins_to("bad", TEN_UTC) is None
+    assert lf._mins_to("2026-13-14T10:00:00Z", TEN_UTC) is None
+
+
+def test_next_departures_skip_out_of_range_times(monkeypatch):
+    speech = _departures_speech(monkeypatch, {"L:C": [
+        {"aimed": "2026-13-14T10:00:00Z"},
+        {"expected": "2026-10-14T10:04:00Z"},
+    ]})
+
+    assert "dans 4 minutes" in speech